@@ -1,12 +1,24 @@
+import time
 from logging.handlers import RotatingFileHandler
 
 from dotenv import load_dotenv, find_dotenv
-from flask import Flask, render_template, session, request, json, jsonify
+from flask import Flask, Response, g, render_template, session, request, jsonify
+from flask.sessions import SecureCookieSessionInterface
 from markupsafe import Markup
 import os
 import logging
 
-from game import Game
+import game_codec
+import metrics
+from log_queue import start_queue_logging
+from game import Game, Game_Size
+from game_pool import GamePool
+from game_store import GameStore, get_game_store
+from pieces.map_cache import MapCache
+from pieces.map_renderer import get_renderer
+from pieces.notebook import Notebook
+from replay import ReplayRecorder
+from status_message import StatusMessage, MALFORMED_TURN
 
 logger = logging.getLogger("")
 
@@ -15,16 +27,178 @@ load_dotenv(find_dotenv(usecwd=True))
 app.config.from_object('config_default')
 app.config.from_envvar('APPLICATION_SETTINGS')
 
+# The cavern map is drawn in-process unless the graphviz renderer is configured.
+Notebook.renderer = get_renderer(app.config.get('MAP_RENDERER', 'builtin'))
+
+# Rendered cavern maps are cached and optionally shared with other worker processes via a directory.
+Notebook.cache = MapCache(maxsize=int(app.config.get('MAP_CACHE_SIZE', 256)),
+                          directory=app.config.get('MAP_CACHE_DIR', None))
+metrics.Collector(lambda: Notebook.cache.stats(), MapCache.METRICS)
+
+# Game states are kept server-side when a game store is configured.  Otherwise they travel in the session cookie.
+game_store = get_game_store(app.config.get('GAME_STORE', 'memory'),
+                            path=app.config.get('GAME_STORE_PATH', 'wumpus.sqlite3'),
+                            ttl=int(app.config.get('GAME_STORE_TTL', 18000)))
+
+# The size of new games.  Larger cavern systems take more room to store, so beyond a few hundred caves, games no longer
+# fit in the session cookie and a server-side game store is needed.
+game_size = Game_Size(int(app.config.get('CAVE_COUNT', Game.STANDARD_SIZE.cave_count)),
+                      int(app.config.get('NEIGHBORING_CAVE_COUNT', Game.STANDARD_SIZE.neighboring_cave_count)),
+                      int(app.config.get('BOTTOMLESS_PIT_COUNT', Game.STANDARD_SIZE.bottomless_pit_count)),
+                      int(app.config.get('BAT_COLONY_COUNT', Game.STANDARD_SIZE.bat_colony_count)))
+
+# Cavern maps are rendered on the server (svg) unless the browser is to lay out and draw them itself from the notebook
+# contents (data).
+map_delivery = app.config.get('MAP_DELIVERY', 'svg')
+
+# Games are recorded in replay logs, from which they may be replayed without flask, when a directory for the logs is
+# configured.
+replay_recorder = ReplayRecorder(app.config['REPLAY_LOG_DIR'],
+                                 max_files=int(app.config.get('REPLAY_LOG_MAX_FILES', 10_000)),
+                                 max_age=int(app.config.get('REPLAY_LOG_MAX_AGE', 604_800))) \
+    if app.config.get('REPLAY_LOG_DIR', None) else None
+
+
+class MeasuredSessionInterface(SecureCookieSessionInterface):
+    """
+    The usual session cookie, the size of which is recorded whenever it is set.  The cookie is set after the
+    after_request functions have run, so it is measured here.
+    """
+
+    def save_session(self, app, session, response):
+        super().save_session(app, session, response)
+        cookie_prefix = self.get_cookie_name(app) + "="
+        for cookie in response.headers.getlist('Set-Cookie'):
+            if cookie.startswith(cookie_prefix):
+                metrics.session_bytes.observe(len(cookie))
+
+
+app.session_interface = MeasuredSessionInterface()
+
 # Format for file logging.
 formatter = logging.Formatter('%(asctime)s \t%(levelname)s\t%(module)s\t%(process)d\t%(thread)d\t%(message)s')
 
 
-# File logger - rotates for every 1Mb up to 5 files.
+# File logger - rotates for every 1Mb up to 5 files.  The file is written on a listener thread, fed by a bounded queue,
+# so that neither writes nor rotations hold up requests.
 file_handler = RotatingFileHandler(os.environ.get("LOG_FILE", 'logs/wumpus.log'), maxBytes=1_000_000, backupCount=5)
 file_handler.setLevel(os.environ.get('LOG_LEVEL', logging.WARN))
 file_handler.setFormatter(formatter)
 logger.setLevel(os.environ.get('LOG_LEVEL', logging.WARN))
-logger.addHandler(file_handler)
+start_queue_logging(logger, [file_handler],
+                    size=int(app.config.get('LOG_QUEUE_SIZE', 10_000)),
+                    overflow=app.config.get('LOG_QUEUE_OVERFLOW', 'drop_newest'))
+
+if not game_store and game_size.cave_count > 200:
+    logger.warning("Games of %d caves are unlikely to fit in the session cookie.  Use the memory or sqlite game "
+                   "store.", game_size.cave_count)
+
+
+def new_game():
+    """
+    Creates a new game along with its starting status messages and its first cavern map.
+    :return: tuple of the game, the starting status messages and the cavern map (the svg or, when the browser draws
+    the map, the map data)
+    """
+    game = Game(rng=Game.start_up(seed=app.config.get('SEED', None)), size=game_size)
+    status = game.hunter.start_up(game.hazards)
+    if map_delivery == 'data':
+        cavern_map = game.hunter.notebook.map_data(game.hunter.cave.id)
+    else:
+        cavern_map = game.hunter.notebook.consult_notebook(game.hunter.cave.id)
+    return game, status, cavern_map
+
+
+# New games are taken from a pool of ready-made games unless a seed is given, in which case each game must be created
+# as the game starts for the results to be reproducible.
+game_pool = GamePool(new_game,
+                     size=int(app.config.get('GAME_POOL_SIZE', 32)),
+                     refill_threshold=int(app.config.get('GAME_POOL_REFILL_THRESHOLD', 16))) \
+    if int(app.config.get('GAME_POOL_SIZE', 32)) and not app.config.get('SEED', None) else None
+if game_pool:
+    metrics.Collector(game_pool.stats, GamePool.METRICS)
+
+
+def update_map(hunter, since_version):
+    """
+    Brings the browser's cavern map up to date.  When the browser reports the version of the map it holds and the
+    renderer is able to, only the changes since that version are sent as a patch.  Otherwise the whole map is sent.
+    :param hunter: the hunter whose notebook is consulted
+    :param since_version: the version of the cavern map held by the browser, if known
+    :return: json compatible dictionary containing the current version of the map along with either the patch
+    (map_patch) or the whole map (notes)
+    """
+    with metrics.phase_seconds.time("render"):
+        notebook = hunter.notebook
+        patch = notebook.consult_notebook_changes(hunter.cave.id, since_version)
+        if patch is not None:
+            return {"map_version": notebook.version, "map_patch": patch}
+        return {"map_version": notebook.version, "notes": Markup(notebook.consult_notebook(hunter.cave.id))}
+
+
+def render_map(hunter, since_version=None):
+    """
+    Updates the hunter's cavern map.  When the browser draws the map, there is nothing to render, so the map data is
+    provided directly.
+    :param hunter: the hunter whose notebook is consulted
+    :param since_version: the version of the cavern map held by the browser, if known
+    :return: json compatible dictionary containing the map update
+    """
+    if map_delivery == 'data':
+        with metrics.phase_seconds.time("render"):
+            return {"map_data": hunter.notebook.map_data(hunter.cave.id)}
+    return update_map(hunter, since_version)
+
+
+def load_game():
+    """
+    Retrieves the game in progress from the game store or, lacking a game store, from the session cookie.
+    :return: the game or None if the game has expired (or was never started).
+    """
+    with metrics.phase_seconds.time("load"):
+        if game_store:
+            game_id = session.get('game_id')
+            return game_store.get(game_id) if game_id else None
+        return game_codec.decode(session['game']) if 'game' in session else None
+
+
+def save_game(game, new_game=False):
+    """
+    Saves the game in progress to the game store, in which case only the game id is kept in the session cookie, or
+    lacking a game store, to the session cookie.
+    :param game: the game to save
+    :param new_game: true if the game is just starting, in which case it is assigned a new game id
+    """
+    with metrics.phase_seconds.time("encode"):
+        if game_store:
+            if new_game or 'game_id' not in session:
+                session['game_id'] = game_store.new_id()
+            game_store.put(session['game_id'], game)
+        else:
+            # Sadly, flask makes use of client-side sessions in the form of a session cookie.  So the state of the game
+            # must be serializable and small enough to be accommodated in a cookie.  The compact encoding is used.
+            session['game'] = game_codec.encode(game)
+            metrics.game_state_bytes.observe(len(session['game']))
+
+
+@app.before_request
+def start_timer():
+    """
+    Notes the time at which the request began.
+    """
+    g.started = time.perf_counter()
+
+
+@app.after_request
+def record_request_duration(response):
+    """
+    Records the duration of the request.
+    :param response: the response to the request
+    :return: the response, unaltered
+    """
+    if 'started' in g:
+        metrics.request_seconds.observe(time.perf_counter() - g.started, request.endpoint or "unknown")
+    return response
 
 
 @app.route('/', methods=['GET'])
@@ -35,70 +209,201 @@ def start():
     """
 
     debug = app.config.get('DEBUG', False)
-    Game.start_up(seed=app.config.get('SEED', None))
-    game = Game()
-    status = game.hunter.start_up(game.hazards)
+    if game_pool:
+        game, status, cavern_map = game_pool.take()
+    else:
+        game, status, cavern_map = new_game()
     if debug:
         game.display_configuration()
         logger.debug(game.hunter)
 
-    # Sadly, flask makes use of client-side sessions in the form of a session cookie.  So the state of the game must be
-    # json serializable and small enough to be accommodated in a cookie.
-    session['game'] = game.to_json()
+    if replay_recorder:
+        session['replay_id'] = GameStore.new_id()
+        replay_recorder.start(session['replay_id'], game)
 
-    cavern_map = game.hunter.notebook.consult_notebook(game.hunter.cave.id)
+    # The game is saved after the map is consulted since consulting the map lays out newly discovered caves.
+    save_game(game, new_game=True)
 
-    return render_template("game_board.html", game=game, status=status, cavern_map=Markup(cavern_map))
+    if map_delivery == 'data':
+        return render_template("game_board.html", game=game, status=status, map_data=cavern_map,
+                               message_catalog=StatusMessage.catalog_to_json())
+    return render_template("game_board.html", game=game, status=status, cavern_map=Markup(cavern_map),
+                           map_version=game.hunter.notebook.version, message_catalog=StatusMessage.catalog_to_json())
 
 
-@app.route('/take_turn', methods=['POST'])
-def take_turn():
+def is_well_formed(turn):
     """
-    Response to an ajax request containing the hunter's turn selections (enter or shoot and cave id).  The only error
-    possible if the browser is used properly, is the omission of a cave id selection.
-    :return: json containing game status messages, arrows remaining, whether the game is over (won or lost), and
-    the cavern map.
+    Checks that a turn is a json object giving the move as a string and the cave id, if any, as a whole number (or a
+    string of one), so that a malformed turn is turned away before it is played.
+    :param turn: the turn as received
+    :return: true if the turn is well formed and false otherwise
     """
+    if not isinstance(turn, dict) or not isinstance(turn.get('move', None), str):
+        return False
+    cave_id = turn.get('cave_id', None)
+    if isinstance(cave_id, str):
+        return cave_id == "" or cave_id.strip().isdecimal()
+    return cave_id is None or (isinstance(cave_id, int) and not isinstance(cave_id, bool))
 
-    debug = app.config.get('DEBUG', False)
-    game = Game.from_json(session['game'])
+
+def is_map_version(map_version):
+    """
+    Checks that the version of the cavern map reported by the browser, if any, is a whole number.
+    :param map_version: the version as received
+    :return: true if the version is absent or a whole number and false otherwise
+    """
+    return map_version is None or (isinstance(map_version, int) and not isinstance(map_version, bool))
+
+
+def is_over(game):
+    """
+    Determines whether the game is over (won or lost).
+    :param game: the game in progress
+    :return: true if either the Wumpus or the hunter is dead
+    """
+    return not(game.wumpus.alive and game.hunter.alive)
+
+
+def game_over():
+    """
+    Response to a request for a turn in a game that is already over.
+    :return: tuple of json containing the error and the 400 status
+    """
+    return jsonify({"errors": ["Your game is over.  Please start a new game."]}), 400
+
+
+def malformed_turn():
+    """
+    Response to a request carrying a malformed turn.
+    :return: tuple of json containing the error, both as an error and as a status message, and the 400 status
+    """
+    return jsonify({"errors": [MALFORMED_TURN.content], "messages": [MALFORMED_TURN.to_json()]}), 400
+
+
+def play_turn(game, turn):
+    """
+    Validates and carries out one of the hunter's turns (enter or shoot and cave id).
+    :param game: the game in progress
+    :param turn: json object containing the move and the cave id
+    :return: a tuple containing a list of status messages and a list of error messages, if any errors are found.
+    """
     messages = []
     errors = []
 
-    cave_id = json.loads(request.data).get('cave_id', None)
-    move = json.loads(request.data).get('move', None)
-    move = move.strip()[0].lower() if move else None
+    cave_id = turn.get('cave_id', None)
+    move = turn.get('move', None)
+    move = move.strip()[:1].lower() if move else None
     cave_id = int(cave_id) if cave_id else None
 
     if move not in ['e', 's']:
         errors.append("You must either enter or shoot into an adjoining cave.")
-    if cave_id not in range(1, 21):
+    if cave_id is None or not game.cavern_system.get_cave(cave_id):
         errors.append("You must select a valid cave id.")
 
     if not errors:
-        if debug and not game.wumpus.asleep:
+        if app.config.get('DEBUG', False) and not game.wumpus.asleep:
             logger.debug(game.wumpus)
-        if move == 'e':
-            messages, errors = game.hunter.enter(cave_id, game.hazards)
-        else:
-            messages, errors = game.hunter.shoot(cave_id, game.hazards)
+        recording = replay_recorder and 'replay_id' in session
+        seed = replay_recorder.begin_turn(game) if recording else None
+        with metrics.phase_seconds.time("turn"):
+            if move == 'e':
+                messages, errors = game.hunter.enter(cave_id, game.hazards)
+            else:
+                messages, errors = game.hunter.shoot(cave_id, game.hazards)
+        if recording:
+            replay_recorder.record(session['replay_id'], move, cave_id, seed, game)
+    return messages, errors
+
+
+def turn_result(game, messages):
+    """
+    Summarizes the outcome of a turn.
+    :param game: the game in progress
+    :param messages: the status messages of the turn
+    :return: json compatible dictionary containing the status messages (by code, where catalogued), the caves adjoining
+    the hunter's cave, the arrows remaining and whether the game is over (won or lost)
+    """
+    return {"messages": [message.to_json() for message in messages],
+            "cave_ids": game.hunter.cave.neighboring_caves,
+            "arrows": game.hunter.quiver,
+            "game_over": is_over(game)}
+
+
+@app.route('/take_turn', methods=['POST'])
+def take_turn():
+    """
+    Response to an ajax request containing the hunter's turn selections (enter or shoot and cave id).  The only error
+    possible if the browser is used properly, is the omission of a cave id selection.  The arrows remaining are
+    returned with each turn so that the browser need not check the quiver separately.
+    :return: json containing game status messages, arrows remaining, whether the game is over (won or lost), and
+    the cavern map (or, if the browser reported the version of the map it holds, the changes to it).
+    """
 
-        # Sadly, flask makes use of client-side sessions in the form of a session cookie.  So the state of the game
-        # must be json serializable and small enough to be accommodated in a cookie.
-        session['game'] = game.to_json()
+    game = load_game()
+    if not game:
+        return jsonify({"errors": ["Your game has expired.  Please start a new game."]}), 400
+    if is_over(game):
+        return game_over()
 
+    turn = request.get_json(force=True, silent=True)
+    if not is_well_formed(turn):
+        return malformed_turn()
+    if not is_map_version(turn.get('map_version', None)):
+        return jsonify({"errors": ["The map version must be a whole number."]}), 400
+    messages, errors = play_turn(game, turn)
     if errors:
         return jsonify({"errors": errors}), 400
 
     # Note that the relevant cave id for the notebook is the cave in which the hunter is located and not the
-    # cave the hunter shoots into (in the event that the hunter took a shot).
-    cavern_map = game.hunter.notebook.consult_notebook(game.hunter.cave.id)
+    # cave the hunter shoots into (in the event that the hunter took a shot).  The game is saved after the map is
+    # consulted since consulting the map lays out newly discovered caves.
+    map_update = render_map(game.hunter, turn.get('map_version', None))
+    save_game(game)
+
+    return jsonify({**turn_result(game, messages), **map_update}), 200
+
+
+@app.route('/take_turns', methods=['POST'])
+def take_turns():
+    """
+    Response to a request containing a sequence of the hunter's turns, as made by bots and replay tooling.  The game is
+    loaded and saved once for the whole sequence.  The turns are taken in order until one is in error or the game is
+    over.  Any remaining turns are not taken.
+    :return: json containing the outcome of each turn taken (along with its errors, if any) and the cavern map as it
+    stands after the last turn taken (or the changes to it).
+    """
+
+    game = load_game()
+    if not game:
+        return jsonify({"errors": ["Your game has expired.  Please start a new game."]}), 400
+    if is_over(game):
+        return game_over()
+
+    body = request.get_json(force=True, silent=True)
+    turns = body.get('turns', None) if isinstance(body, dict) else None
+    if not isinstance(turns, list) or not turns:
+        return jsonify({"errors": ["You must provide a list of turns."]}), 400
+    if len(turns) > int(app.config.get('TURN_BATCH_LIMIT', 100)):
+        return jsonify({"errors": [f"No more than {app.config.get('TURN_BATCH_LIMIT', 100)} turns may be "
+                                   f"taken at once."]}), 400
+    if not all(is_well_formed(turn) for turn in turns):
+        return malformed_turn()
+    if not is_map_version(body.get('map_version', None)):
+        return jsonify({"errors": ["The map version must be a whole number."]}), 400
 
-    return jsonify({"messages": [message.to_json() for message in messages],
-                    "cave_ids": game.hunter.cave.neighboring_caves,
-                    "arrows": game.hunter.quiver,
-                    "game_over": not(game.wumpus.alive and game.hunter.alive),
-                    "notes": Markup(cavern_map)}), 200
+    results = []
+    for turn in turns:
+        if is_over(game):
+            break
+        messages, errors = play_turn(game, turn)
+        results.append({**turn_result(game, messages), "errors": errors})
+        if errors:
+            break
+
+    map_update = render_map(game.hunter, body.get('map_version', None))
+    save_game(game)
+
+    return jsonify({"results": results, **map_update}), 200
 
 
 @app.route('/check_quiver', methods=['GET'])
@@ -108,9 +413,35 @@ def check_quiver():
     :return: json object indicating number of arrows remaining.
     """
 
-    game = Game.from_json(session['game'])
+    game = load_game()
+    if not game:
+        return jsonify({"errors": ["Your game has expired.  Please start a new game."]}), 400
     return {"arrows": game.hunter.quiver}
 
+
+@app.route('/messages', methods=['GET'])
+def messages():
+    """
+    Provides the catalog of status messages whose content never varies, so that bots and replay tooling can look up
+    the codes carried in the responses to turns.
+    :return: json object of code to status message (type, source and content)
+    """
+
+    return jsonify(StatusMessage.catalog_to_json())
+
+
+@app.route('/metrics', methods=['GET'])
+def serve_metrics():
+    """
+    Provides the request durations, the durations of the phases of requests (load, turn, render and encode) and the
+    session sizes, as histograms, along with the game pool's and the map cache's counts, in the Prometheus text format,
+    for scraping.
+    :return: the metrics as text
+    """
+
+    return Response(metrics.exposition(), mimetype="text/plain; version=0.0.4")
+
+
 @app.route('/rules', methods=['GET'])
 def rules():
     """
@@ -121,4 +452,6 @@ def rules():
     return render_template("rules.html")
 
 
-app.run()
+if __name__ == "__main__":
+    # The flask development server.  In production, serve the application with gunicorn through wsgi.py.
+    app.run()
@@ -0,0 +1,284 @@
+"""
+Benchmarks of the hot paths of the game loop, from the creation of the cavern system to full /take_turn requests
+through flask's test client.  Every scenario is seeded, so each run times exactly the same work.  The results of each
+run are appended to a json history file and compared with the previous run recorded there.  Should any scenario have
+slowed by more than the threshold, the run fails.  The history is kept with the machine it was recorded on and is not
+committed (it is git ignored).  Run from the top level of the wumpus project:
+
+python -m benchmarks.hot_paths --rounds 5 --threshold 0.25
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from collections import namedtuple
+
+import game_codec
+from game import Game, Game_Size
+from pieces.cavern_system import CavernSystem
+from pieces.map_cache import MapCache
+from pieces.notebook import Notebook
+
+# A scenario's setup takes a seed and returns the operation to time along with a function to be called (untimed)
+# before each operation, if any.
+Benchmark = namedtuple("Benchmark", ["name", "setup"])
+
+BenchmarkResult = namedtuple("BenchmarkResult", ["name", "operations", "median", "best", "p95"])
+
+# Numbers of mapped sites in the notebooks of the scenarios depending on the notebook's size.
+NOTEBOOK_SIZES = (1, 5, 10, 20)
+
+# Number of caves in the cavern systems of the large map scenarios.
+LARGE_CAVE_COUNT = 10_000
+
+# Each round runs the operation at least this many seconds.
+ROUND_DURATION = 0.1
+
+DEFAULT_HISTORY = os.path.join(os.path.dirname(__file__), "history.json")
+
+
+def explored_game(seed, mapped_site_count):
+    """
+    Provides a game in which the hunter has noted the given number of caves, visited in breadth first order from the
+    starting cave.  The hunter notes the hazard warnings of each cave without encountering the hazards themselves,
+    so the notebook may be of any size.  The hunter ends in the last cave noted and the cavern map is laid out.
+    :param seed: seed for the game's random number generator
+    :param mapped_site_count: number of caves to note
+    :return: the game
+    """
+    game = Game(rng=random.Random(seed))
+    hunter = game.hunter
+    order = [hunter.cave.id]
+    for cave_id in order:
+        order.extend(neighboring_cave for neighboring_cave in game.cavern_system.get_cave(cave_id).neighboring_caves
+                     if neighboring_cave not in order)
+    for cave_id in order[:mapped_site_count]:
+        hunter.cave = game.cavern_system.get_cave(cave_id)
+        hunter.notebook.note_position(hunter.cave, hunter.check_for_hazards(game.hazards))
+    hunter.notebook.prepare(hunter.cave.id)
+    return game
+
+
+def create_cavern_system(seed):
+    rng = random.Random(seed)
+    return lambda: CavernSystem.create_cavern_system(rng), None
+
+
+def get_cave(seed):
+    cavern_system = CavernSystem(rng=random.Random(seed))
+    cave_ids = list(range(1, CavernSystem.CAVE_COUNT + 1)) * 50
+
+    def look_up():
+        for cave_id in cave_ids:
+            cavern_system.get_cave(cave_id)
+    return look_up, None
+
+
+def create_large_game(seed):
+    rng = random.Random(seed)
+    size = Game_Size(LARGE_CAVE_COUNT, 3, 2, 2)
+    return lambda: Game(rng=random.Random(rng.getrandbits(64)), size=size), None
+
+
+def large_codec_round_trip(seed):
+    state = game_codec.encode(Game(rng=random.Random(seed), size=Game_Size(LARGE_CAVE_COUNT, 3, 2, 2)))
+
+    def round_trip():
+        game = game_codec.decode(state)
+        game.hazards, game.hunter.notebook
+        game_codec.encode(game)
+    return round_trip, None
+
+
+def json_round_trip(mapped_site_count):
+    def setup(seed):
+        state = json.dumps(explored_game(seed, mapped_site_count).to_json())
+
+        def round_trip():
+            # The game is reconstituted lazily, so every piece is used to reconstitute it in full.
+            game = Game.from_json(json.loads(state))
+            game.hazards, game.hunter.notebook
+            json.dumps(game.to_json())
+        return round_trip, None
+    return setup
+
+
+def codec_round_trip(mapped_site_count):
+    def setup(seed):
+        state = game_codec.encode(explored_game(seed, mapped_site_count))
+
+        def round_trip():
+            game = game_codec.decode(state)
+            game.hazards, game.hunter.notebook
+            game_codec.encode(game)
+        return round_trip, None
+    return setup
+
+
+def consult_notebook(mapped_site_count):
+    def setup(seed):
+        game = explored_game(seed, mapped_site_count)
+        notebook = game.hunter.notebook
+
+        # Uncached, so that the map is drawn every time.
+        Notebook.cache = MapCache(maxsize=0)
+        return lambda: notebook.consult_notebook(game.hunter.cave.id), None
+    return setup
+
+
+def take_turn(seed):
+    # The app reads its configuration as it is imported.  The seed makes every game the same game.
+    os.environ.setdefault("SECRET_KEY", "benchmark")
+    os.environ.setdefault("APPLICATION_SETTINGS", os.path.abspath("config_default.py"))
+    os.environ["SEED"] = str(seed)
+    from app import app
+    Notebook.cache = MapCache(maxsize=int(app.config.get('MAP_CACHE_SIZE', 256)))
+    client = app.test_client()
+    rng = random.Random(seed)
+    state = {"cave_ids": None, "map_version": None}
+
+    def start():
+        # A new game is started (untimed) whenever the last one ended.
+        if state["cave_ids"] is None:
+            page = client.get("/")
+            assert page.status_code == 200
+            state["cave_ids"] = start_cave_ids(page.get_data(as_text=True))
+            state["map_version"] = None
+
+    def turn():
+        move = "shoot" if rng.random() < 0.1 else "enter"
+        response = client.post("/take_turn", json={"move": move, "cave_id": rng.choice(state["cave_ids"]),
+                                                   "map_version": state["map_version"]})
+        result = response.get_json()
+        state["cave_ids"] = None if result["game_over"] else result["cave_ids"]
+        state["map_version"] = result.get("map_version")
+    return turn, start
+
+
+def start_cave_ids(page):
+    """
+    Finds the caves adjoining the hunter's starting cave among the options of the game board's cave selector.
+    :param page: the game board
+    :return: list of cave ids
+    """
+    selector = page[page.index('id="cave_id"'):page.index("</select>")]
+    return [int(option.split('"')[1]) for option in selector.split("<option value=")[2:]]
+
+
+BENCHMARKS = [Benchmark("create_cavern_system", create_cavern_system),
+              Benchmark("get_cave_x1000", get_cave),
+              *[Benchmark(f"json_round_trip_{size}_sites", json_round_trip(size)) for size in NOTEBOOK_SIZES],
+              *[Benchmark(f"codec_round_trip_{size}_sites", codec_round_trip(size)) for size in NOTEBOOK_SIZES],
+              *[Benchmark(f"consult_notebook_{size}_sites", consult_notebook(size)) for size in NOTEBOOK_SIZES],
+              Benchmark(f"create_game_{LARGE_CAVE_COUNT}_caves", create_large_game),
+              Benchmark(f"codec_round_trip_{LARGE_CAVE_COUNT}_caves", large_codec_round_trip),
+              Benchmark("take_turn_request", take_turn)]
+
+
+def run(benchmark, seed, rounds):
+    """
+    Times a scenario.  The number of operations per round is chosen so that a round lasts at least ROUND_DURATION
+    seconds.  Only the operations themselves are timed.
+    :param benchmark: the scenario
+    :param seed: seed for the scenario
+    :param rounds: number of rounds
+    :return: the result, giving the median over the rounds of the mean duration of an operation, the best such mean
+    and the 95th percentile of the durations of the individual operations, all in microseconds
+    """
+    operation, before = benchmark.setup(seed)
+
+    def timed_round(operations):
+        durations = []
+        for _ in range(operations):
+            if before:
+                before()
+            started = time.perf_counter()
+            operation()
+            durations.append(time.perf_counter() - started)
+        return durations
+
+    # Warm up and calibrate.
+    operations = max(int(ROUND_DURATION / max(statistics.mean(timed_round(10)), 1e-9)), 10)
+    durations = [timed_round(operations) for _ in range(rounds)]
+    means = [statistics.mean(round_durations) * 1e6 for round_durations in durations]
+    everything = sorted(duration for round_durations in durations for duration in round_durations)
+    return BenchmarkResult(benchmark.name, operations, statistics.median(means), min(means),
+                           everything[int(0.95 * (len(everything) - 1))] * 1e6)
+
+
+def git_commit():
+    """
+    The commit being benchmarked, if known.
+    """
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def regressions(results, previous, threshold):
+    """
+    Compares the results with those of a previous run.
+    :param results: dictionary of scenario name to result of this run
+    :param previous: dictionary of scenario name to result of the previous run
+    :param threshold: allowable slow down, as a fraction
+    :return: list of (name, previous median, median) tuples for the scenarios that slowed by more than the threshold
+    """
+    return [(name, previous[name]["median"], result["median"]) for name, result in results.items()
+            if name in previous and result["median"] > previous[name]["median"] * (1 + threshold)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmarks the hot paths of the game loop.")
+    parser.add_argument("--rounds", type=int, default=5, help="number of timed rounds per scenario")
+    parser.add_argument("--seed", type=int, default=1, help="seed for the scenarios")
+    parser.add_argument("--only", nargs="*", help="names of the scenarios to run (all by default)")
+    parser.add_argument("--history", default=DEFAULT_HISTORY, help="json file to which the results are appended")
+    parser.add_argument("--threshold", type=float, default=0.25,
+                        help="allowable slow down of a scenario against the previous run, as a fraction")
+    parser.add_argument("--no-save", action="store_true", help="compare with the history without adding to it")
+    args = parser.parse_args()
+
+    results = {}
+    for benchmark in BENCHMARKS:
+        if args.only and benchmark.name not in args.only:
+            continue
+        result = run(benchmark, args.seed, args.rounds)
+        results[result.name] = {"operations": result.operations, "median": result.median, "best": result.best,
+                                "p95": result.p95}
+        print(f"{result.name:<32} median {result.median:10.1f}us  best {result.best:10.1f}us  "
+              f"p95 {result.p95:10.1f}us  ({result.operations} per round)")
+
+    history = []
+    if os.path.exists(args.history):
+        with open(args.history) as history_file:
+            history = json.load(history_file)
+    slower = regressions(results, history[-1]["results"], args.threshold) if history else []
+
+    if not args.no_save:
+        history.append({"time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                        "commit": git_commit(),
+                        "python": platform.python_version(),
+                        "machine": platform.node(),
+                        "seed": args.seed,
+                        "rounds": args.rounds,
+                        "results": results})
+        with open(args.history, "w") as history_file:
+            json.dump(history, history_file, indent=2)
+
+    for name, previous_median, median in slower:
+        print(f"REGRESSION: {name} took {median:.1f}us against {previous_median:.1f}us previously")
+    if slower:
+        print(f"FAILED: {len(slower)} scenario(s) slowed by more than {args.threshold:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
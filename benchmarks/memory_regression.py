@@ -0,0 +1,92 @@
+"""
+Memory regression benchmark.  Plays a large number of turns, reconstituting the game from its encoded state before
+each turn just as the web application does for each request, and verifies that the resident set size of the process
+stays flat once warmed up.  Run from the top level of the wumpus project:
+
+python -m benchmarks.memory_regression --turns 1000000
+"""
+
+import argparse
+import gc
+import os
+import random
+import resource
+import sys
+import time
+
+import game_codec
+from game import Game
+
+
+def resident_set_size():
+    """
+    Current resident set size of this process in bytes.  Falls back on the peak resident set size where /proc is not
+    available.
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except OSError:
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak if sys.platform == "darwin" else peak * 1024
+
+
+def play(turns, seed, samples):
+    """
+    Plays the given number of turns, starting a new game whenever a game ends.  Each turn the hunter enters a randomly
+    chosen adjoining cave or, now and then, shoots into one.
+    :param turns: number of turns to play
+    :param seed: seed for the random number generator
+    :param samples: number of times the resident set size is sampled over the run
+    :return: list of (turn, resident set size) samples
+    """
+    rng = random.Random(seed)
+    state = None
+    sample_interval = max(turns // samples, 1)
+    measurements = []
+    for turn in range(turns):
+        if state is None:
+            game = Game(rng=random.Random(rng.getrandbits(64)))
+            game.hunter.start_up(game.hazards)
+        else:
+            game = game_codec.decode(state)
+        neighboring_caves = game.hunter.cave.neighboring_caves
+        if rng.random() < 0.1:
+            game.hunter.shoot(rng.choice(neighboring_caves), game.hazards)
+        else:
+            game.hunter.enter(rng.choice(neighboring_caves), game.hazards)
+        state = game_codec.encode(game) if game.hunter.alive and game.wumpus.alive else None
+        if turn % sample_interval == 0:
+            gc.collect()
+            measurements.append((turn, resident_set_size()))
+    return measurements
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verifies that memory use stays flat over many turns.")
+    parser.add_argument("--turns", type=int, default=1_000_000, help="number of turns to play")
+    parser.add_argument("--seed", type=int, default=1, help="seed for the random number generator")
+    parser.add_argument("--samples", type=int, default=20, help="number of memory samples taken")
+    parser.add_argument("--tolerance", type=float, default=0.05,
+                        help="allowable growth in resident set size after warming up, as a fraction")
+    args = parser.parse_args()
+
+    started = time.perf_counter()
+    measurements = play(args.turns, args.seed, args.samples)
+    elapsed = time.perf_counter() - started
+
+    # The first quarter of the run is taken as warm up.
+    baseline = max(rss for _, rss in measurements[:max(len(measurements) // 4, 1)])
+    final = max(rss for _, rss in measurements)
+    growth = (final - baseline) / baseline
+    for turn, rss in measurements:
+        print(f"turn {turn:>9}: {rss / 1_000_000:8.2f} MB")
+    print(f"{args.turns} turns in {elapsed:.1f}s ({args.turns / elapsed:.0f} turns/s).  "
+          f"Growth after warm up: {growth:.2%}")
+    if growth > args.tolerance:
+        print(f"FAILED: resident set size grew by more than {args.tolerance:.0%}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,6 +3,29 @@ from datetime import timedelta
 
 DEBUG = True
 SEED = os.environ.get("SEED", None)
+MAP_RENDERER = os.environ.get("MAP_RENDERER", "builtin")
+MAP_DELIVERY = os.environ.get("MAP_DELIVERY", "svg")
+MAP_CACHE_SIZE = int(os.environ.get("MAP_CACHE_SIZE", 256))
+MAP_CACHE_DIR = os.environ.get("MAP_CACHE_DIR", None)
+GAME_STORE = os.environ.get("GAME_STORE", "memory")
+GAME_STORE_PATH = os.environ.get("GAME_STORE_PATH", "wumpus.sqlite3")
+GAME_STORE_TTL = int(os.environ.get("GAME_STORE_TTL", 18000))
+GAME_POOL_SIZE = int(os.environ.get("GAME_POOL_SIZE", 32))
+GAME_POOL_REFILL_THRESHOLD = int(os.environ.get("GAME_POOL_REFILL_THRESHOLD", 16))
+CAVE_COUNT = int(os.environ.get("CAVE_COUNT", 20))
+NEIGHBORING_CAVE_COUNT = int(os.environ.get("NEIGHBORING_CAVE_COUNT", 3))
+BOTTOMLESS_PIT_COUNT = int(os.environ.get("BOTTOMLESS_PIT_COUNT", 2))
+BAT_COLONY_COUNT = int(os.environ.get("BAT_COLONY_COUNT", 2))
+TURN_BATCH_LIMIT = int(os.environ.get("TURN_BATCH_LIMIT", 100))
+WEB_WORKERS = int(os.environ.get("WEB_WORKERS", 1))
+WEB_THREADS = int(os.environ.get("WEB_THREADS", 8))
+HOST = os.environ.get("HOST", "127.0.0.1")
+PORT = int(os.environ.get("PORT", 8000))
+LOG_QUEUE_SIZE = int(os.environ.get("LOG_QUEUE_SIZE", 10000))
+LOG_QUEUE_OVERFLOW = os.environ.get("LOG_QUEUE_OVERFLOW", "drop_newest")
+REPLAY_LOG_DIR = os.environ.get("REPLAY_LOG_DIR", None)
+REPLAY_LOG_MAX_FILES = int(os.environ.get("REPLAY_LOG_MAX_FILES", 10000))
+REPLAY_LOG_MAX_AGE = int(os.environ.get("REPLAY_LOG_MAX_AGE", 604800))
 ENV = 'development'
 JSONIFY_PRETTYPRINT_REGULAR = False
 PROPAGATE_EXCEPTIONS = True
@@ -0,0 +1,12 @@
+"""
+Test configuration.  The tests run from the top level of the wumpus project, which pytest puts on the path through
+this file, so that the game's modules are imported just as the application imports them.  The application reads its
+settings as it is imported, so they are provided here.
+"""
+
+import os
+import tempfile
+
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("APPLICATION_SETTINGS", os.path.join(os.path.dirname(__file__), "config_default.py"))
+os.environ.setdefault("LOG_FILE", os.path.join(tempfile.mkdtemp(), "wumpus.log"))
@@ -1,17 +1,29 @@
-from datetime import datetime
+import logging
 import random
+from collections import namedtuple
 
 from pieces.cavern_system import CavernSystem, Cave
-from pieces.hazard import BottomlessPit, BatColony, Hazard
+from pieces.hazard import BottomlessPit, BatColony
 from pieces.hunter import Hunter
 from pieces.wumpus import Wumpus
-from flask import current_app
 from pprint import pformat
 
+logger = logging.getLogger(__name__)
+
+
+# The dimensions of a game: the number of caves, the number of neighboring caves of each cave and the numbers of
+# bottomless pits and bat colonies.
+Game_Size = namedtuple("Game_Size", ["cave_count", "neighboring_cave_count", "bottomless_pit_count",
+                                     "bat_colony_count"])
+
 
 class Game:
 
-    def __init__(self, cavern_system=None, wumpus=None, bottomless_pits=None, bats=None, hunter=None):
+    # The size of the classic game.
+    STANDARD_SIZE = Game_Size(CavernSystem.CAVE_COUNT, CavernSystem.NEIGHBORING_CAVE_COUNT, 2, 2)
+
+    def __init__(self, cavern_system=None, wumpus=None, bottomless_pits=None, bats=None, hunter=None, rng=None,
+                 size=None):
         """
         Initializes or reconstitutes the game state.  At the start of a game, the cavern system layout, the
         positions of the hazards and the location of the hunter are established essentially randomly.  At each
@@ -21,10 +33,19 @@ class Game:
         :param bottomless_pits: the bottomless pits
         :param bats: the bat colonies
         :param hunter: the hunter
+        :param rng: the game's own random number generator.  All of the game's random draws are taken from it so that
+        concurrent games neither interfere with one another nor with their reproducibility.
+        :param size: the dimensions of a new game.  Defaults to the standard size.  A reconstituted game takes its
+        dimensions from its pieces.
         """
 
+        self.rng = rng or random.Random()
+        size = size or Game.STANDARD_SIZE
+
         # Use current cavern system or create a new cavern system.
-        self.cavern_system = cavern_system or CavernSystem()
+        self.cavern_system = cavern_system or CavernSystem(rng=self.rng, cave_count=size.cave_count,
+                                                           neighboring_cave_count=size.neighboring_cave_count)
+        cave_count = self.cavern_system.cave_count
 
         # Hazard added to list in descending order from most pertinent and deadly
         self.hazards = []
@@ -32,25 +53,32 @@ class Game:
         # Use current wumpus or create new wumpus
         self.wumpus = wumpus
         if not self.wumpus:
-            wumpus_cave_id = random.choice(range(1, 21))
-            self.wumpus = Wumpus(self.cavern_system, wumpus_cave_id)
+            wumpus_cave_id = self.rng.choice(range(1, cave_count + 1))
+            self.wumpus = Wumpus(self.cavern_system, wumpus_cave_id, rng=self.rng)
         self.hazards.append(self.wumpus)
 
-        # Use current bottomless pit or create new bottomless pits
-        self.bottomless_pits = bottomless_pits or [BottomlessPit(self.cavern_system, cave_id)
-                                                   for cave_id in random.sample(range(1, 21), 2)]
+        # Use current bottomless pit or create new bottomless pits.  Sampling from a range of cave ids draws only as
+        # many cave ids as are needed.
+        self.bottomless_pits = bottomless_pits or [BottomlessPit(self.cavern_system, cave_id, self.rng)
+                                                   for cave_id in self.rng.sample(range(1, cave_count + 1),
+                                                                                  size.bottomless_pit_count)]
         self.hazards.extend(self.bottomless_pits)
 
         # Use current bat colonies or create new bat colonies
-        self.bats = bats or [BatColony(self.cavern_system, cave_id)
-                             for cave_id in random.sample(range(1, 21), 2)]
+        self.bats = bats or [BatColony(self.cavern_system, cave_id, self.rng)
+                             for cave_id in self.rng.sample(range(1, cave_count + 1), size.bat_colony_count)]
         self.hazards.extend(self.bats)
 
-        # Use current hunter or create new hunter
+        # Use current hunter or create new hunter.  The hunter is never placed in a cave occupied by one of this game's
+        # hazards.
         self.hunter = hunter
         if not self.hunter:
-            hunter_cave_id_options = list(set(range(1, 21)) - set(Hazard.hazard_cave_ids))
-            self.hunter = Hunter(self.cavern_system, random.choice(hunter_cave_id_options))
+            hazard_cave_ids = {hazard.cave.id for hazard in self.hazards}
+            if len(hazard_cave_ids) >= cave_count:
+                raise ValueError("There is no cave free of hazards in which to place the hunter.")
+            self.hunter = Hunter(self.cavern_system,
+                                 CavernSystem.nth_cave_id(self.rng.randrange(cave_count - len(hazard_cave_ids)),
+                                                          cave_count, hazard_cave_ids))
 
     def display_configuration(self):
         """
@@ -58,22 +86,38 @@ class Game:
         once awoken.
         :return:
         """
-        current_app.logger.debug(pformat(self.cavern_system.cavern_system))
+        # The cavern system is only pretty printed if the log record is actually to be emitted.
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+        logger.debug(pformat(self.cavern_system.cavern_system))
         for hazard in self.hazards:
-            current_app.logger.debug(hazard)
+            logger.debug(hazard)
 
     @staticmethod
     def start_up(seed=None):
         """
-        The method runs only when a new game is begun.  Old cavern_map files are deleted from the notes folder and if
-        no seed is provided the current timestamp is used instead to seed the randon number generator.
+        The method runs only when a new game is begun.  It provides the random number generator for the new game.  If
+        no seed is provided, a seed is drawn from the operating system's source of randomness.  Either way, the seed
+        is logged so that the game may be reproduced.
         :param seed: a provided seed for the random number generator.
+        :return: the random number generator for the new game.
         """
 
         # Create 'random' seed if no seed is provided
-        seed = int(seed) if seed else datetime.now()
-        current_app.logger.debug(f"Seed: {seed}")
-        random.seed(seed)
+        seed = int(seed) if seed else random.SystemRandom().getrandbits(64)
+        logger.debug("Seed: %s", seed)
+        return random.Random(seed)
+
+    def rng_state(self):
+        """
+        Captures the state of the game's random number generator in a single 64 bit integer.  A seed is drawn from the
+        generator and the generator is reseeded with it, so that a generator seeded with the integer returned draws
+        exactly as this game's generator will from now on.
+        :return: seed from which the random number generator is to be restored
+        """
+        seed = self.rng.getrandbits(64)
+        self.rng.seed(seed)
+        return seed
 
     def to_json(self):
         return {
@@ -84,22 +128,54 @@ class Game:
             },
             "bottomless_pits": [bottomless_pit.to_json() for bottomless_pit in self.bottomless_pits],
             "bat_colonies": [bat_colony.to_json() for bat_colony in self.bats],
-            "hunter": self.hunter.to_json()
+            "hunter": self.hunter.to_json(),
+            "rng_state": self.rng_state()
         }
 
     @staticmethod
     def from_json(json):
-        cavern_system_json = json.get("cavern_system")
-        caves = [Cave(cave[0], cave[1]) for cave in cavern_system_json]
-        cavern_system = CavernSystem(caves)
-        hunter = Hunter.from_json(cavern_system, json.get("hunter"))
-        wumpus = Wumpus.from_json(cavern_system, json.get("wumpus"))
-        bottomless_pits = [BottomlessPit.from_json(cavern_system, bottomless_pit)
-                           for bottomless_pit in json.get("bottomless_pits")]
-        bats = [BatColony.from_json(cavern_system, bat_colony)
-                for bat_colony in json.get("bat_colonies")]
-        return Game(cavern_system=cavern_system,
-                    wumpus=wumpus,
-                    bottomless_pits=bottomless_pits,
-                    bats=bats,
-                    hunter=hunter)
+        """
+        Restores the game state from a json object.  The pieces of the game are reconstituted only as they are used.
+        :param json: the json object holding the game state
+        :return: the reconstituted game
+        """
+        return LazyGame({
+            "rng": lambda game: random.Random(json.get("rng_state")),
+            "cavern_system": lambda game: CavernSystem([Cave(cave[0], cave[1]) for cave in json.get("cavern_system")]),
+            "wumpus": lambda game: Wumpus.from_json(game.cavern_system, json.get("wumpus"), game.rng),
+            "bottomless_pits": lambda game: [BottomlessPit.from_json(game.cavern_system, bottomless_pit, game.rng)
+                                             for bottomless_pit in json.get("bottomless_pits")],
+            "bats": lambda game: [BatColony.from_json(game.cavern_system, bat_colony, game.rng)
+                                  for bat_colony in json.get("bat_colonies")],
+            "hunter": lambda game: Hunter.from_json(game.cavern_system, json.get("hunter"))
+        })
+
+
+class LazyGame(Game):
+    """
+    A game reconstituted from its saved state piece by piece, as each piece is first used.  Most requests use only some
+    of the pieces (checking the quiver needs just the hunter and a move in error, nothing at all), so the remaining
+    pieces are never reconstituted.  Once reconstituted, a piece is an ordinary attribute of the game.
+    """
+
+    def __init__(self, loaders):
+        """
+        Initializes the game without reconstituting any of its pieces.
+        :param loaders: dictionary of the name of each piece of the game (rng, cavern_system, wumpus, bottomless_pits,
+        bats and hunter) to a function reconstituting the piece.  The function is given the game so that it may draw
+        on the other pieces.
+        """
+        self.loaders = loaders
+
+    def __getattr__(self, name):
+        # Only called for pieces not yet reconstituted.
+        if name == "loaders":
+            raise AttributeError(name)
+        if name == "hazards":
+            value = [self.wumpus, *self.bottomless_pits, *self.bats]
+        elif name in self.loaders:
+            value = self.loaders[name](self)
+        else:
+            raise AttributeError(f"'{self.__class__.__name__}' object has no attribute '{name}'")
+        setattr(self, name, value)
+        return value
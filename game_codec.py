@@ -0,0 +1,178 @@
+"""
+A compact, versioned binary encoding of the game state, used in place of the json representation wherever the game
+state is stored.  The encoding consists of a fixed header followed by a body whose layout is determined by the counts
+given in the header, so the body is decoded with a single struct unpack:
+
+header: version, cave count, neighboring cave count, number of bottomless pits, number of bat colonies, number of
+        mapped sites, number of map positions, number of map stamps (version 3 onwards)
+body:   the state of the game's random number generator (version 2 onwards), the cavern system as a table of
+        neighboring cave ids (cave count x neighboring cave count cave ids), the Wumpus' cave id and the game's flags,
+        the cave ids of the bottomless pits and of the bat colonies, the hunter's cave id and quiver, the mapped sites as cave id
+        and warning flag pairs, the map positions as cave id, column and rank triples and the map stamps as cave id,
+        version and flags triples (version 3 onwards).
+
+Up to version 3, cave ids and counts take a byte each.  Version 4 widens cave ids and counts to two bytes, map
+positions to two bytes a coordinate and map versions to four bytes.  Games that fit in version 3 (those of no more
+than 255 caves, which includes the standard game) are encoded in version 3, so their encodings are no larger than
+before, and the others in version 4.
+
+The game's flags note whether the Wumpus is asleep, whether the Wumpus is dead and whether the hunter is dead.  Since
+the flags are only set for a finished game, games encoded before deaths were noted decode as games in progress.  The
+notebook's warnings are held as warning flags, which are stored as they are.
+"""
+
+import random
+import struct
+from functools import lru_cache
+
+from game import LazyGame
+from pieces.cavern_system import CavernSystem, Cave
+from pieces.hazard import BottomlessPit, BatColony
+from pieces.hunter import Hunter
+from pieces.notebook import Mapped_Site, Notebook
+from pieces.wumpus import Wumpus
+
+
+VERSION = 3
+WIDE_VERSION = 4
+
+HEADERS = {1: struct.Struct(">7B"), 2: struct.Struct(">7B"), 3: struct.Struct(">8B"), 4: struct.Struct(">BHBHHHHH")}
+
+WUMPUS_ASLEEP = 0x01
+WUMPUS_DEAD = 0x02
+HUNTER_DEAD = 0x04
+
+
+@lru_cache(maxsize=1024)
+def body_struct(version, cave_count, neighboring_cave_count, bottomless_pit_count, bat_colony_count, site_count,
+                position_count, stamp_count=0):
+    """
+    Provides the struct describing the body of an encoded game having the version and counts given in its header.
+    Version 1 lacks the state of the random number generator and versions 1 and 2 lack the map stamps.
+    """
+    cave_id = "H" if version > 3 else "B"
+    position = cave_id + ("hh" if version > 3 else "bB")
+    stamp = "HIB" if version > 3 else "BHB"
+    return struct.Struct(">" + ("Q" if version > 1 else "") + f"{cave_count * neighboring_cave_count}{cave_id}"
+                         + cave_id + "B" + f"{bottomless_pit_count}{cave_id}" + f"{bat_colony_count}{cave_id}"
+                         + cave_id + "B" + (cave_id + "B") * site_count + position * position_count
+                         + stamp * stamp_count)
+
+
+def fits_version(caves, positions, stamps):
+    """
+    Determines whether a game fits in the narrower encoding of VERSION.
+    :param caves: the caves of the cavern system
+    :param positions: the notebook's map positions
+    :param stamps: the notebook's map stamps
+    :return: true if the game fits
+    """
+    return len(caves) <= 0xFF \
+        and all(-0x80 <= column < 0x80 and 0 <= rank <= 0xFF for column, rank in positions.values()) \
+        and all(stamp <= 0xFFFF for stamp, _ in stamps.values())
+
+
+def encode(game):
+    """
+    Encodes the game state.
+    :param game: the game
+    :return: the encoded game state as bytes
+    """
+    caves = game.cavern_system.caves[1:]
+    neighboring_cave_count = len(caves[0].neighboring_caves)
+    cavern_map = game.hunter.notebook.cavern_map
+    positions = game.hunter.notebook.positions
+    stamps = game.hunter.notebook.stamps
+    version = VERSION if fits_version(caves, positions, stamps) else WIDE_VERSION
+    header = HEADERS[version].pack(version, len(caves), neighboring_cave_count, len(game.bottomless_pits),
+                                   len(game.bats), len(cavern_map), len(positions), len(stamps))
+    values = [game.rng_state()]
+    values.extend(neighboring_cave for cave in caves for neighboring_cave in cave.neighboring_caves)
+    flags = (WUMPUS_ASLEEP if game.wumpus.asleep else 0) | (0 if game.wumpus.alive else WUMPUS_DEAD) \
+        | (0 if game.hunter.alive else HUNTER_DEAD)
+    values.extend([game.wumpus.cave.id, flags])
+    values.extend(bottomless_pit.cave.id for bottomless_pit in game.bottomless_pits)
+    values.extend(bat_colony.cave.id for bat_colony in game.bats)
+    values.extend([game.hunter.cave.id, game.hunter.quiver])
+    for mapped_site in cavern_map.values():
+        values.extend([mapped_site.cave.id, mapped_site.warnings])
+    for cave_id, (column, rank) in positions.items():
+        values.extend([cave_id, column, rank])
+    for cave_id, (stamp, flags) in stamps.items():
+        values.extend([cave_id, stamp, flags])
+    return header + body_struct(*HEADERS[version].unpack(header)).pack(*values)
+
+
+def decode(data):
+    """
+    Reconstitutes the game from its encoded state.  The body is unpacked at once but the pieces of the game are
+    reconstituted only as they are used (see LazyGame).  Games encoded before the state of the random number generator
+    was included get a freshly seeded generator and games encoded before the map stamps were included start a new
+    series of cavern map versions.
+    :param data: the encoded game state as bytes
+    :return: the reconstituted game
+    """
+    version = data[0]
+    if version not in HEADERS:
+        raise ValueError(f"Unsupported game encoding version {version}.")
+    _, *counts = HEADERS[version].unpack_from(data)
+    cave_count, neighboring_cave_count, bottomless_pit_count, bat_colony_count, site_count, position_count = counts[:6]
+    stamp_count = counts[6] if version > 2 else 0
+    values = body_struct(version, *counts).unpack_from(data, HEADERS[version].size)
+    if version > 1:
+        seed = values[0]
+        values = values[1:]
+    else:
+        seed = None
+
+    wumpus_offset = cave_count * neighboring_cave_count
+    flags = values[wumpus_offset + 1]
+    bottomless_pit_offset = wumpus_offset + 2
+    bat_colony_offset = bottomless_pit_offset + bottomless_pit_count
+    hunter_offset = bat_colony_offset + bat_colony_count
+    site_offset = hunter_offset + 2
+    position_offset = site_offset + 2 * site_count
+    stamp_offset = position_offset + 3 * position_count
+
+    def cavern_system(game):
+        return CavernSystem([Cave(cave_id, list(values[(cave_id - 1) * neighboring_cave_count:
+                                                       cave_id * neighboring_cave_count]))
+                             for cave_id in range(1, cave_count + 1)])
+
+    def wumpus(game):
+        restored = Wumpus(game.cavern_system, values[wumpus_offset], bool(flags & WUMPUS_ASLEEP), game.rng)
+        restored.alive = not flags & WUMPUS_DEAD
+        return restored
+
+    def bottomless_pits(game):
+        return [BottomlessPit(game.cavern_system, cave_id, game.rng)
+                for cave_id in values[bottomless_pit_offset: bat_colony_offset]]
+
+    def bats(game):
+        return [BatColony(game.cavern_system, cave_id, game.rng) for cave_id in values[bat_colony_offset: hunter_offset]]
+
+    def notebook(cavern_system):
+        cavern_map = [Mapped_Site(cavern_system.get_cave(cave_id), flags)
+                      for cave_id, flags in zip(values[site_offset: position_offset: 2],
+                                                values[site_offset + 1: position_offset: 2])]
+        positions = {values[index]: (values[index + 1], values[index + 2])
+                     for index in range(position_offset, stamp_offset, 3)}
+        stamps = {values[index]: (values[index + 1], values[index + 2])
+                  for index in range(stamp_offset, stamp_offset + 3 * stamp_count, 3)}
+        return Notebook(cavern_map=cavern_map, positions=positions, stamps=stamps)
+
+    def hunter(game):
+        cavern_system = game.cavern_system
+        restored = Hunter(cavern_system, values[hunter_offset], quiver=values[hunter_offset + 1],
+                          notebook=lambda: notebook(cavern_system))
+        restored.alive = not flags & HUNTER_DEAD
+        return restored
+
+    return LazyGame({
+        "rng": lambda game: random.Random(seed),
+        "cavern_system": cavern_system,
+        "wumpus": wumpus,
+        "bottomless_pits": bottomless_pits,
+        "bats": bats,
+        "hunter": hunter
+    })
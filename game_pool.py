@@ -0,0 +1,134 @@
+import logging
+import os
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+
+class GamePool:
+    """
+    A pool of ready-made game starting configurations, each consisting of a new game, its starting status messages
+    and its first rendered cavern map.  A background thread keeps the pool topped up so that starting a game amounts
+    to taking an entry from the pool.  Should the pool run dry under a burst of new games, entries are made on demand.
+    """
+
+    # The statistics of the pool exposed as metrics (see metrics.Collector).
+    METRICS = [("hits", "wumpus_game_pool_hits_total", "counter", "New games taken from the game pool."),
+               ("misses", "wumpus_game_pool_misses_total", "counter",
+                "New games made on demand because the game pool had run dry."),
+               ("depletions", "wumpus_game_pool_depletions_total", "counter", "Times the game pool has run dry."),
+               ("refills", "wumpus_game_pool_refills_total", "counter", "Times the game pool has been topped up."),
+               ("available", "wumpus_game_pool_available", "gauge", "Games ready in the game pool."),
+               ("low_water_mark", "wumpus_game_pool_low_water_mark", "gauge",
+                "Fewest games the game pool has held.")]
+
+    def __init__(self, factory, size=32, refill_threshold=16):
+        """
+        Initializes the pool.  The pool is filled, and the background thread started, only when the pool is started
+        (when a worker process starts or, failing that, when the first entry is taken) so that worker processes forked
+        from a parent process each have their own entries and run their own thread.
+        :param factory: callable returning a tuple of a new game, its starting status messages and its cavern map
+        :param size: the number of entries the pool is topped up to
+        :param refill_threshold: the pool is topped up when the number of entries falls to this level.  It is kept
+        below the size, since a full pool needs no topping up.
+        """
+        self.factory = factory
+        self.size = size
+        self.refill_threshold = max(min(refill_threshold, size - 1), 0)
+        self.entries = deque()
+        self.condition = threading.Condition()
+        self.thread = None
+        self.pid = None
+        self.hits = 0
+        self.misses = 0
+        self.depletions = 0
+        self.dry = False
+        self.refills = 0
+        self.low_water_mark = size
+
+    def take(self):
+        """
+        Provides a game starting configuration, from the pool if one is available and otherwise made on demand.
+        :return: tuple of a new game, its starting status messages and its cavern map
+        """
+        self.start()
+        with self.condition:
+            if self.entries:
+                entry = self.entries.popleft()
+                self.hits += 1
+                self.dry = False
+            else:
+                entry = None
+                self.misses += 1
+                if not self.dry:
+                    self.dry = True
+                    self.depletions += 1
+                    logger.warning("The game pool has run dry.  New games are being made on demand.")
+            self.low_water_mark = min(self.low_water_mark, len(self.entries))
+            if len(self.entries) <= self.refill_threshold:
+                self.condition.notify()
+        return entry if entry else self.factory()
+
+    def start(self):
+        """
+        Fills the pool and starts the background thread if the pool has not already been started in this process.
+        The pool is filled before the thread takes over so that the first games of a process are taken from the pool
+        rather than made on demand.  Anyone taking an entry meanwhile waits for the pool to be filled.
+        """
+        with self.condition:
+            if self.thread and self.pid == os.getpid():
+                return
+            self.entries.clear()
+            self.pid = os.getpid()
+            for _ in range(self.size):
+                try:
+                    self.entries.append(self.factory())
+                except Exception:
+                    logger.exception("Unable to add a game to the game pool.")
+                    break
+            self.thread = threading.Thread(target=self.refill, name="game-pool", daemon=True)
+            self.thread.start()
+
+    def refill(self):
+        """
+        Runs in the background thread, topping up the pool whenever the number of entries falls to the refill
+        threshold.
+        """
+        while True:
+            with self.condition:
+                while len(self.entries) > self.refill_threshold:
+                    self.condition.wait()
+                needed = self.size - len(self.entries)
+                if needed <= 0:
+                    continue
+                self.refills += 1
+            started = time.perf_counter()
+            for _ in range(needed):
+                try:
+                    entry = self.factory()
+                except Exception:
+                    logger.exception("Unable to add a game to the game pool.")
+                    time.sleep(1)
+                    break
+                with self.condition:
+                    self.entries.append(entry)
+            logger.debug("Added %s games to the game pool in %.3fs.", needed, time.perf_counter() - started)
+
+    def stats(self):
+        """
+        Reports the state of the pool.  Misses count the games that had to be made on demand because the pool had run
+        dry, depletions count the times the pool ran dry (however many misses followed) and the low water mark is the
+        fewest entries the pool has held.
+        :return: dictionary of pool metrics
+        """
+        with self.condition:
+            return {"size": self.size,
+                    "refill_threshold": self.refill_threshold,
+                    "available": len(self.entries),
+                    "hits": self.hits,
+                    "misses": self.misses,
+                    "depletions": self.depletions,
+                    "refills": self.refills,
+                    "low_water_mark": self.low_water_mark}
@@ -0,0 +1,166 @@
+import secrets
+import sqlite3
+import threading
+import time
+
+import game_codec
+
+
+class GameStore:
+    """
+    A generic version of a server-side store of game states from which all game stores descend.  Only a small game id
+    need travel in the session cookie.  The game state itself stays on the server.
+    """
+
+    def __init__(self, ttl=18000):
+        """
+        Initializes the store.
+        :param ttl: number of seconds a game is retained after it was last saved
+        """
+        self.ttl = ttl
+
+    @staticmethod
+    def new_id():
+        """
+        Provides a new, unguessable game id.
+        :return: the game id
+        """
+        return secrets.token_urlsafe(16)
+
+    @staticmethod
+    def encode(game):
+        """
+        Converts the game into the compact binary form in which it is stored.
+        """
+        return game_codec.encode(game)
+
+    @staticmethod
+    def decode(state):
+        """
+        Reconstitutes the game from the compact binary form in which it is stored.
+        """
+        return game_codec.decode(state)
+
+    def get(self, game_id):
+        """
+        Each store implements the retrieval of a game.
+        :param game_id: id of the game sought
+        :return: the game or None if no unexpired game has that id
+        """
+        raise NotImplementedError
+
+    def put(self, game_id, game):
+        """
+        Each store implements the saving of a game.
+        :param game_id: id of the game to save
+        :param game: the game
+        """
+        raise NotImplementedError
+
+
+class MemoryGameStore(GameStore):
+    """
+    Holds the games in memory, within a single process.  The games are held in their compact binary form rather than
+    as objects, so that concurrent requests for the same game each work on their own copy of the game rather than
+    racing one another over a shared one.  Since games are reconstituted lazily, little more than the pieces a turn
+    uses are decoded.
+    """
+
+    # Expired games are purged after this many saves.
+    PURGE_INTERVAL = 1000
+
+    def __init__(self, ttl=18000):
+        super().__init__(ttl)
+        self.games = {}
+        self.lock = threading.Lock()
+        self.saves = 0
+
+    def get(self, game_id):
+        with self.lock:
+            entry = self.games.get(game_id)
+            if not entry:
+                return None
+            expires, state = entry
+            if expires < time.monotonic():
+                del self.games[game_id]
+                return None
+        return MemoryGameStore.decode(state)
+
+    def put(self, game_id, game):
+        state = MemoryGameStore.encode(game)
+        with self.lock:
+            now = time.monotonic()
+            self.games[game_id] = (now + self.ttl, state)
+            self.saves += 1
+            if self.saves % MemoryGameStore.PURGE_INTERVAL == 0:
+                self.games = {game_id: entry for game_id, entry in self.games.items() if entry[0] >= now}
+
+
+class SqliteGameStore(GameStore):
+    """
+    Holds the games in a sqlite database so that the games may be shared by several worker processes.
+    """
+
+    # Expired games are purged after this many saves by a given process.
+    PURGE_INTERVAL = 1000
+
+    def __init__(self, path, ttl=18000):
+        """
+        Initializes the store, creating the database table if need be.
+        :param path: location of the sqlite database file
+        :param ttl: number of seconds a game is retained after it was last saved
+        """
+        super().__init__(ttl)
+        self.path = path
+        self.local = threading.local()
+        self.lock = threading.Lock()
+        self.saves = 0
+        with self.connection() as connection:
+            connection.execute("CREATE TABLE IF NOT EXISTS games "
+                               "(id TEXT PRIMARY KEY, expires REAL NOT NULL, state BLOB NOT NULL)")
+
+    def connection(self):
+        """
+        Sqlite connections may not be shared across threads, so each thread gets its own.
+        :return: this thread's connection to the database
+        """
+        connection = getattr(self.local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=10)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+            self.local.connection = connection
+        return connection
+
+    def get(self, game_id):
+        row = self.connection().execute("SELECT state FROM games WHERE id = ? AND expires >= ?",
+                                        (game_id, time.time())).fetchone()
+        return SqliteGameStore.decode(row[0]) if row else None
+
+    def put(self, game_id, game):
+        now = time.time()
+        with self.connection() as connection:
+            connection.execute("INSERT OR REPLACE INTO games (id, expires, state) VALUES (?, ?, ?)",
+                               (game_id, now + self.ttl, SqliteGameStore.encode(game)))
+            with self.lock:
+                self.saves += 1
+                purge = self.saves % SqliteGameStore.PURGE_INTERVAL == 0
+            if purge:
+                connection.execute("DELETE FROM games WHERE expires < ?", (now,))
+
+
+def get_game_store(name, path=None, ttl=18000):
+    """
+    Provides a server-side game store by name.
+    :param name: memory, sqlite or cookie.  The cookie store indicates that no server-side store is used.
+    :param path: location of the sqlite database file
+    :param ttl: number of seconds a game is retained after it was last saved
+    :return: an instance of the game store named or None if the game is to be kept in the session cookie
+    """
+    if name == "memory":
+        return MemoryGameStore(ttl)
+    if name == "sqlite":
+        return SqliteGameStore(path, ttl)
+    if name == "cookie":
+        return None
+    raise ValueError(f"Unknown game store {name}.  Choose one of memory, sqlite, cookie.")
@@ -0,0 +1,107 @@
+"""
+Logging that never stalls a request.  Log records are put on a bounded queue by the request threads and written out
+(to a rotating file, say) by a listener thread.  Should the queue fill up because the listener falls behind, records
+are dropped rather than making the request wait, and the number dropped is itself logged once there is room again.
+"""
+
+import atexit
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+
+# Overflow policies: drop the record being logged or make room for it by dropping the oldest record waiting.
+DROP_NEWEST = "drop_newest"
+DROP_OLDEST = "drop_oldest"
+OVERFLOW_POLICIES = (DROP_NEWEST, DROP_OLDEST)
+
+
+class BoundedQueueHandler(QueueHandler):
+    """
+    A queue handler which, rather than blocking, drops records according to its overflow policy when the queue is
+    full.
+    """
+
+    def __init__(self, log_queue, overflow=DROP_NEWEST):
+        """
+        Initializes the handler.
+        :param log_queue: the bounded queue shared with the listener
+        :param overflow: drop_newest or drop_oldest
+        """
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown log queue overflow policy {overflow}.")
+        super().__init__(log_queue)
+        self.overflow = overflow
+        self.dropped = 0
+
+    def enqueue(self, record):
+        # A count of the records dropped precedes the next record to make it onto the queue, provided there is room
+        # for the count without dropping yet another record.  Records are enqueued under the handler's lock, so the
+        # count needs no lock of its own.
+        if self.dropped and not self.queue.full():
+            self.queue.put_nowait(self.dropped_record(self.dropped))
+            self.dropped = 0
+        if not self.offer(record):
+            self.dropped += 1
+
+    def offer(self, record):
+        """
+        Puts a record on the queue without waiting, dropping a record if the queue is full.
+        :param record: the log record
+        :return: true if the record was put on the queue and false if it was itself dropped
+        """
+        try:
+            self.queue.put_nowait(record)
+            return True
+        except queue.Full:
+            if self.overflow == DROP_NEWEST:
+                return False
+        try:
+            self.queue.get_nowait()
+            self.dropped += 1
+        except queue.Empty:
+            pass
+        try:
+            self.queue.put_nowait(record)
+            return True
+        except queue.Full:
+            return False
+
+    def dropped_record(self, dropped):
+        """
+        Provides a warning noting the number of records dropped since the last such warning.
+        :param dropped: the number of records dropped
+        """
+        record = logging.LogRecord(__name__, logging.WARNING, __file__, 0,
+                                   f"{dropped} log records were dropped because the log queue was full.", None, None)
+        return self.prepare(record)
+
+
+def start_queue_logging(logger, handlers, size=10_000, overflow=DROP_NEWEST):
+    """
+    Routes the logger's records through a bounded queue to the given handlers, which are run on a listener thread.
+    The listener is stopped, after writing out any records still queued, when the process exits.  A process forked
+    from this one (e.g., a gunicorn worker forked from the master, which imported the application) does not inherit
+    the listener thread, so it starts a queue and a listener of its own.
+    :param logger: the logger (usually the root logger)
+    :param handlers: the handlers that actually write out the records (e.g., a rotating file handler).  Each
+    handler's own level is respected.
+    :param size: the maximum number of records queued
+    :param overflow: drop_newest or drop_oldest
+    :return: the listener
+    """
+    handler = BoundedQueueHandler(queue.Queue(maxsize=size), overflow)
+    logger.addHandler(handler)
+    listeners = [QueueListener(handler.queue, *handlers, respect_handler_level=True)]
+    listeners[0].start()
+    atexit.register(lambda: listeners[0].stop())
+
+    def restart_in_child():
+        handler.queue = queue.Queue(maxsize=size)
+        handler.dropped = 0
+        listeners[0] = QueueListener(handler.queue, *handlers, respect_handler_level=True)
+        listeners[0].start()
+
+    if hasattr(os, "register_at_fork"):
+        os.register_at_fork(after_in_child=restart_in_child)
+    return listeners[0]
@@ -0,0 +1,141 @@
+"""
+In-process metrics, aggregated as histograms and exposed in the Prometheus text format.  Each worker process keeps its
+own metrics, so with more than one worker process, each scrape reports on whichever worker process serves it.
+"""
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds of the histogram buckets, in seconds for durations and in bytes for sizes.
+DURATION_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+SIZE_BUCKETS = (64, 128, 256, 512, 1024, 2048, 4096)
+
+# All histograms and collectors, in the order in which they are exposed.
+registry = []
+
+
+class Histogram:
+    """
+    Counts observations (e.g., durations) falling into each of a fixed set of buckets, along with their sum, for each
+    combination of label values.  Observations may be made from any thread.
+    """
+
+    def __init__(self, name, documentation, buckets, label_names=()):
+        """
+        Initializes the histogram and adds it to the registry.
+        :param name: the metric name
+        :param documentation: the help text of the metric
+        :param buckets: the ascending upper bounds of the buckets.  A final, unbounded bucket is implied.
+        :param label_names: the names of the labels distinguishing the series of the histogram
+        """
+        self.name = name
+        self.documentation = documentation
+        self.buckets = tuple(buckets)
+        self.label_names = tuple(label_names)
+        self.series = {}
+        self.lock = threading.Lock()
+        registry.append(self)
+
+    def observe(self, value, *label_values):
+        """
+        Records an observation.
+        :param value: the value observed
+        :param label_values: the values of the histogram's labels, in order
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self.lock:
+            series = self.series.get(label_values)
+            if series is None:
+                series = self.series[label_values] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][index] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, *label_values):
+        """
+        Times the enclosed block, which is observed in seconds whether or not it raises.
+        :param label_values: the values of the histogram's labels, in order
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *label_values)
+
+    def exposition(self):
+        """
+        Describes the histogram in the Prometheus text format.  Bucket counts are cumulative.
+        :return: list of lines
+        """
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self.lock:
+            series = sorted((label_values, list(counts), total)
+                            for label_values, (counts, total) in self.series.items())
+        for label_values, counts, total in series:
+            labels = ",".join(f'{name}="{value}"' for name, value in zip(self.label_names, label_values))
+            separator = "," if labels else ""
+            cumulative = 0
+            for bound, count in zip(self.buckets + ("+Inf",), counts):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{labels}{separator}le="{bound}"}} {cumulative}')
+            suffix = f"{{{labels}}}" if labels else ""
+            lines.append(f"{self.name}_sum{suffix} {total}")
+            lines.append(f"{self.name}_count{suffix} {cumulative}")
+        return lines
+
+
+class Collector:
+    """
+    Metrics read from a component's own statistics (e.g., the game pool's counts) whenever they are scraped, rather
+    than observed as they change.
+    """
+
+    def __init__(self, stats, metrics):
+        """
+        Initializes the collector and adds it to the registry.
+        :param stats: function providing the dictionary of the component's current statistics
+        :param metrics: list of tuples of the statistic, the metric name, the metric type (counter or gauge) and the
+        help text of the metric
+        """
+        self.stats = stats
+        self.metrics = metrics
+        registry.append(self)
+
+    def exposition(self):
+        """
+        Describes the component's statistics in the Prometheus text format.
+        :return: list of lines
+        """
+        stats = self.stats()
+        lines = []
+        for statistic, name, metric_type, documentation in self.metrics:
+            lines.extend([f"# HELP {name} {documentation}", f"# TYPE {name} {metric_type}",
+                          f"{name} {stats[statistic]}"])
+        return lines
+
+
+def exposition():
+    """
+    Describes all of the histograms and collectors in the registry in the Prometheus text format.
+    :return: the metrics as text
+    """
+    return "\n".join(line for histogram in registry for line in histogram.exposition()) + "\n"
+
+
+# Duration of each request, by endpoint.
+request_seconds = Histogram("wumpus_request_duration_seconds", "Duration of requests, by endpoint.",
+                            DURATION_BUCKETS, ("endpoint",))
+
+# Duration of each phase of a request: load (retrieving the game from the store or the session cookie), turn (the
+# hunter entering or shooting), render (bringing the cavern map up to date) and encode (saving the game).  Games are
+# reconstituted lazily, so load covers only fetching the game state and reading its header.  Each piece of the game
+# is decoded when first used and so is charged to the phase using it first, which is nearly always the turn.
+phase_seconds = Histogram("wumpus_phase_duration_seconds", "Duration of the phases of requests, by phase.",
+                          DURATION_BUCKETS, ("phase",))
+
+# Size of the session cookie set by each response setting one, and of the encoded game state it carries, if any.
+session_bytes = Histogram("wumpus_session_cookie_bytes", "Size of the session cookies set.", SIZE_BUCKETS)
+game_state_bytes = Histogram("wumpus_session_game_state_bytes", "Size of the encoded game states kept in the session "
+                             "cookie.", SIZE_BUCKETS)
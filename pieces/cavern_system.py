@@ -5,148 +5,321 @@ from collections import namedtuple
 Cave = namedtuple("Cave", ["id", "neighboring_caves"])
 
 
+class LazyTable:
+    """
+    A table indexed by cave id whose entries are computed when first looked up, so that only the entries actually used
+    are computed, however many caves there are.
+    """
+
+    def __init__(self, compute):
+        """
+        Initializes the table.
+        :param compute: function computing the entry for a cave id
+        """
+        self.compute = compute
+        self.entries = {}
+
+    def __getitem__(self, cave_id):
+        try:
+            return self.entries[cave_id]
+        except KeyError:
+            entry = self.entries[cave_id] = self.compute(cave_id)
+            return entry
+
+
 class CavernSystem:
     """
     Essentially the game board for Hunt the Wumpus.  The construction of a instance of this class provides the cavern
     system into which the hazards and the hunter will be deposited.
     """
 
+    # The size of the cavern system, unless a game calls for another.
     CAVE_COUNT = 20
-    CAVES = tuple(range(1, CAVE_COUNT + 1))
     NEIGHBORING_CAVE_COUNT = 3
 
-    def __init__(self, cavern_system=None):
+    # Cave ids are encoded in two bytes.
+    MAX_CAVE_COUNT = 65535
+
+    def __init__(self, cavern_system=None, rng=None, cave_count=None, neighboring_cave_count=None):
         """
         Initializes the cavern system for the game using a random seed.  The cavern system is converted from
         a dictionary into a list and named tuples since the cavern arrangement does not change over the course of
         the game.
+        :param cavern_system: list of cave named tuples, if the cavern system is being reconstituted
+        :param rng: the game's random number generator, used to create a new cavern system
+        :param cave_count: number of caves in a new cavern system.  Defaults to CAVE_COUNT.
+        :param neighboring_cave_count: number of neighboring caves of each cave in a new cavern system.  Defaults to
+        NEIGHBORING_CAVE_COUNT.
         """
         self.cavern_system = cavern_system if cavern_system \
             else [Cave(cave_id, neighboring_caves)
                   for cave_id, neighboring_caves
-                  in CavernSystem.create_cavern_system().items()]
+                  in CavernSystem.create_cavern_system(rng or random, cave_count, neighboring_cave_count).items()]
+
+        # Index the caves by cave id (position 0 is unused) so that caves and their neighbors may be looked up in
+        # constant time.
+        caves = [None] * (len(self.cavern_system) + 1)
+        for cave in self.cavern_system:
+            caves[cave.id] = cave
+        self.caves = tuple(caves)
+        self.cave_count = len(self.cavern_system)
+
+        # The sets of neighboring caves and the bit masks below are derived from the caves as they are looked up, since
+        # a game uses only the few belonging to its hazards and its hunter, however many caves there are.
+        self.neighboring_cave_sets = LazyTable(lambda cave_id: frozenset(self.caves[cave_id].neighboring_caves))
+
+        # Represent sets of caves as bit masks in which cave id n is bit n - 1.  The masks of the caves within one and
+        # within two tunnels of a cave are computed once so that the hazard perimeters are found with a lookup and
+        # the hunter's proximity to a hazard with a bitwise and.
+        self.cave_masks = LazyTable(lambda cave_id: 1 << (cave_id - 1))
+        self.neighborhood_masks = LazyTable(self.neighborhood_mask)
+        self.two_hop_neighborhood_masks = LazyTable(self.two_hop_neighborhood_mask)
+
+    def neighborhood_mask(self, cave_id):
+        """
+        Computes the bit mask of the caves neighboring a cave.
+        :param cave_id: the cave id
+        :return: the bit mask
+        """
+        return sum(self.cave_masks[neighboring_cave] for neighboring_cave in self.neighboring_cave_sets[cave_id])
+
+    def two_hop_neighborhood_mask(self, cave_id):
+        """
+        Computes the bit mask of the caves within two tunnels of a cave (which includes the cave itself).
+        :param cave_id: the cave id
+        :return: the bit mask
+        """
+        mask = self.neighborhood_masks[cave_id]
+        for neighboring_cave in self.neighboring_cave_sets[cave_id]:
+            mask |= self.neighborhood_masks[neighboring_cave]
+        return mask
 
     def __str__(self):
         return [cave for cave in self.cavern_system]
 
+    # Number of random tunnel swaps attempted per tunnel when shuffling the cavern system.  Each swap moves two
+    # tunnels, so every tunnel is moved some six times over.
+    SWAPS_PER_TUNNEL = 3
+
+    # The classic cavern system of the standard size: the caves are the vertices of a dodecahedron, listed here by
+    # position along with the positions of their neighboring caves.
+    DODECAHEDRON = ((1, 4, 7), (0, 2, 9), (1, 3, 11), (2, 4, 13), (0, 3, 5), (4, 6, 14), (5, 7, 16), (0, 6, 8),
+                    (7, 9, 17), (1, 8, 10), (9, 11, 18), (2, 10, 12), (11, 13, 19), (3, 12, 14), (5, 13, 15),
+                    (14, 16, 19), (6, 15, 17), (8, 16, 18), (10, 17, 19), (12, 15, 18))
+
     @staticmethod
-    def create_cavern_system():
+    def create_cavern_system(rng=random, cave_count=None, neighboring_cave_count=None):
         """
-        Creates a cavern system containing CAVE_COUNT caves and exactly NEIGHBORING_CAVE_COUNT neighboring caves each.
+        Creates a cavern system containing cave_count caves and exactly neighboring_cave_count neighboring caves each.
         Cave ids are randomly determined.  No cave will have duplicated neighboring caves or itself as a neighboring
-        cave.
+        cave and every cave can be reached from every other cave.  A cavern system of the standard size is the classic
+        dodecahedron with its caves randomly numbered.  Any other starts out as a ring of caves (with additional tunnels
+        across the ring) which is then shuffled by a fixed number of random tunnel swaps, any disconnected portions are
+        rejoined and the caves are randomly renumbered.  So the time taken is bounded and linear in the number of
+        caves, whatever the random draws.
+        :param rng: the random number generator to draw from
+        :param cave_count: number of caves.  Defaults to CAVE_COUNT.
+        :param neighboring_cave_count: number of neighboring caves of each cave.  Defaults to NEIGHBORING_CAVE_COUNT.
         :return: a dictionary of the cavern system in which the keys represent the caves and the values, a list of the
-        three interconnected caves.
-        """
-
-        # Prepopulate cavern system with 20 unlinked caves to start with and start a list of caves available for
-        # linking as neighbors.
-        caverns = {cave: [] for cave in CavernSystem.CAVES}
-        available_caves = list(CavernSystem.CAVES)
-
-        # All caves in the cavern system must be linked to exactly NEIGHBORING_CAVE_COUNT neighboring caves.
-        while (any([len(neighboring_caves) < CavernSystem.NEIGHBORING_CAVE_COUNT
-                    for neighboring_caves
-                    in caverns.values()])):
-
-            # Iterate over all the caves in the cavern system
-            for cave in CavernSystem.CAVES:
-
-                # Identify how many neighboring caves are needed to complete the given cave and create those
-                # neighboring caves
-                missing_neighboring_caves = CavernSystem.NEIGHBORING_CAVE_COUNT - len(caverns[cave])
-                if missing_neighboring_caves:
-
-                    # Insure that the cave itself is not selected as a neighboring cave
-                    candidate_neighboring_caves = [available_cave for available_cave
-                                                   in available_caves if available_cave != cave]
-
-                    # Only find as many missing neighboring caves as there are caves available.  If no caves are
-                    # available, swap this cave with a random neighboring cave of a different, randomly selected cave.
-                    missing_neighboring_caves = min(missing_neighboring_caves, len(candidate_neighboring_caves))
-                    if not missing_neighboring_caves:
-                        CavernSystem.swap_neighboring_caves(cave, caverns, available_caves)
-
-                    # Otherwise get as many neighboring caves as possible up to the number needed to populate the
-                    # neighbors for the current cave.
-                    else:
-                        selected_neighboring_caves = random.sample(candidate_neighboring_caves,
-                                                                   missing_neighboring_caves)
-
-                        # Iterate over the selected neighboring caves
-                        for selected_neighboring_cave in selected_neighboring_caves:
-
-                            # Add the selected neighboring cave as a neighboring cave to the cave being populated.
-                            # Likewise, add the cave being populated as a neighbor to the selected neighboring cave.
-                            caverns[cave].append(selected_neighboring_cave)
-                            caverns[selected_neighboring_cave].append(cave)
-
-                            # If the cave being populated is still in the list of available caves but now has a full
-                            # complement of neighbors, remove it from the available caves list.
-                            if cave in available_caves \
-                                    and len(caverns[cave]) >= CavernSystem.NEIGHBORING_CAVE_COUNT:
-                                available_caves.remove(cave)
-
-                            # If the cave selected to be a neighbor now has a full complement of neighbors, remove
-                            # it from the available caves list.
-                            if len(caverns[selected_neighboring_cave]) >= CavernSystem.NEIGHBORING_CAVE_COUNT:
-                                available_caves.remove(selected_neighboring_cave)
+        interconnected caves.
+        """
+        cave_count = cave_count or CavernSystem.CAVE_COUNT
+        neighboring_cave_count = neighboring_cave_count or CavernSystem.NEIGHBORING_CAVE_COUNT
+        if neighboring_cave_count < 2 or cave_count <= neighboring_cave_count \
+                or (cave_count * neighboring_cave_count) % 2 or cave_count > CavernSystem.MAX_CAVE_COUNT:
+            raise ValueError(f"A cavern system of {cave_count} caves having {neighboring_cave_count} neighboring caves "
+                             f"each cannot be created.")
+
+        # Caves are identified by their positions 0 through cave_count - 1 until they are renumbered at the end.  A
+        # cavern system of the standard size is the dodecahedron, which needs only renumbering.
+        if (cave_count, neighboring_cave_count) == (CavernSystem.CAVE_COUNT, CavernSystem.NEIGHBORING_CAVE_COUNT):
+            caverns = CavernSystem.DODECAHEDRON
+        else:
+            caverns = CavernSystem.create_ring(cave_count, neighboring_cave_count)
+            tunnels = [(cave, neighboring_cave) for cave in range(cave_count)
+                       for neighboring_cave in caverns[cave] if cave < neighboring_cave]
+
+            # Swap the ends of randomly selected pairs of tunnels - (a, b) and (c, d) become (a, c) and (b, d) -
+            # rejecting any swap that would link a cave to itself or duplicate a tunnel.
+            for _ in range(CavernSystem.SWAPS_PER_TUNNEL * len(tunnels)):
+                first, second = rng.randrange(len(tunnels)), rng.randrange(len(tunnels))
+                (a, b), (c, d) = tunnels[first], tunnels[second]
+                if rng.random() < 0.5:
+                    c, d = d, c
+                if a == c or b == d or c in caverns[a] or d in caverns[b]:
+                    continue
+                caverns[a].remove(b)
+                caverns[b].remove(a)
+                caverns[c].remove(d)
+                caverns[d].remove(c)
+                caverns[a].add(c)
+                caverns[c].add(a)
+                caverns[b].add(d)
+                caverns[d].add(b)
+                tunnels[first], tunnels[second] = (a, c), (b, d)
+
+            CavernSystem.connect_portions(caverns)
+
+        # Renumber the caves randomly.
+        cave_ids = rng.sample(range(1, cave_count + 1), cave_count)
+        cavern_system = {cave_id: None for cave_id in range(1, cave_count + 1)}
+        for cave, neighboring_caves in enumerate(caverns):
+            cavern_system[cave_ids[cave]] = sorted(cave_ids[neighboring_cave] for neighboring_cave in neighboring_caves)
+        return cavern_system
+
+    @staticmethod
+    def create_ring(cave_count, neighboring_cave_count):
+        """
+        Creates a connected cavern system in which the caves form a ring.  Each cave is linked to the caves up to
+        neighboring_cave_count // 2 positions away on either side and, if the number of neighboring caves is odd, to
+        the cave directly across the ring.
+        :param cave_count: number of caves
+        :param neighboring_cave_count: number of neighboring caves for each cave
+        :return: list of sets of neighboring cave positions, indexed by cave position
+        """
+        caverns = [set() for _ in range(cave_count)]
+        for cave in range(cave_count):
+            for step in range(1, neighboring_cave_count // 2 + 1):
+                caverns[cave].add((cave + step) % cave_count)
+                caverns[cave].add((cave - step) % cave_count)
+            if neighboring_cave_count % 2:
+                caverns[cave].add((cave + cave_count // 2) % cave_count)
         return caverns
 
     @staticmethod
-    def swap_neighboring_caves(cave_to_populate, caverns, available_caves):
-        """
-        It is possible that the last cave to be populated will encounter an empty list of available caves aside from
-        itself.  In that case, we switch its id with that of a cave that is already serving as a neighboring cave
-        elsewhere in the cavern and we use the neighboring cave obtained in this way as a neighboring cave for our
-        under-populated cave.  This way happen multiple times for the same cave (i.e., the cave have one than one
-        neighboring cave absent).
-        :param cave_to_populate: cave that still requires at least one neighboring cave
-        :param caverns: the current arrangement of caves
-        :param available_caves: list of caves available for use as neighboring caves.  This should probably only
-        contain this under-populated cave at this point.
-        """
-
-        # Identify those caves we might use as a neighboring cave.  Avoid choosing the cave we are to populate
-        # with neighbors or one that already serves as a neighboring cave to the cave we are to populate.
-        candidate_neighboring_caves = [cave for cave in CavernSystem.CAVES
-                                       if cave != cave_to_populate
-                                       and cave not in caverns[cave_to_populate]]
-
-        # Randomly selected a neighboring cave from the candidate caves
-        selected_cave = random.sample(candidate_neighboring_caves, 1)[0]
-
-        # Iterate over all the caves in the cavern system to find the first case where the selected neighboring
-        # cave is used as such.  Also make sure that the cave possessing this neighboring cave does not also have
-        # the cave to populate as a neighbor.
-        for cave, neighboring_caves in caverns.items():
-            if selected_cave in neighboring_caves and cave_to_populate not in neighboring_caves:
-
-                # Swap the cave to populate in place of the selected neighboring cave in the cave originally housing it
-                # and add the neighboring cave to the list of neighboring caves of the cave to populate.
-                neighboring_caves[neighboring_caves.index(selected_cave)] = cave_to_populate
-                caverns[cave_to_populate].append(selected_cave)
-
-                # The the cave to populate now has a full complement of neighboring caves, drop it from the list of
-                # available caves.
-                if len(caverns[cave_to_populate]) >= CavernSystem.NEIGHBORING_CAVE_COUNT:
-                    available_caves.remove(cave_to_populate)
-                break
+    def connect_portions(caverns):
+        """
+        Random tunnel swaps may split the cavern system into disconnected portions.  Each additional portion is joined
+        to the first by swapping the ends of a tunnel lying on a loop in the first portion with those of a tunnel
+        lying on a loop in the additional portion.  Since neither tunnel was the sole link between the two parts of
+        its portion, the portions become connected.  One of the two new tunnels itself lies on a loop and so serves for
+        joining the next portion.  Every portion has a loop since every cave has at least two neighboring caves.
+        :param caverns: list of sets of neighboring cave positions, indexed by cave position, modified in place
+        """
+        portions = CavernSystem.find_portions(caverns)
+        if len(portions) == 1:
+            return
+        a, b = CavernSystem.find_loop_tunnel(caverns, portions[0])
+        for portion in portions[1:]:
+            c, d = CavernSystem.find_loop_tunnel(caverns, portion)
+            caverns[a].remove(b)
+            caverns[b].remove(a)
+            caverns[c].remove(d)
+            caverns[d].remove(c)
+            caverns[a].add(c)
+            caverns[c].add(a)
+            caverns[b].add(d)
+            caverns[d].add(b)
+            b = c
+
+    @staticmethod
+    def find_portions(caverns):
+        """
+        Identifies the connected portions of the cavern system.
+        :param caverns: list of sets of neighboring cave positions, indexed by cave position
+        :return: list of the first cave position found in each portion
+        """
+        visited = [False] * len(caverns)
+        portions = []
+        for start in range(len(caverns)):
+            if visited[start]:
+                continue
+            portions.append(start)
+            visited[start] = True
+            stack = [start]
+            while stack:
+                for neighboring_cave in caverns[stack.pop()]:
+                    if not visited[neighboring_cave]:
+                        visited[neighboring_cave] = True
+                        stack.append(neighboring_cave)
+        return portions
+
+    @staticmethod
+    def find_loop_tunnel(caverns, start):
+        """
+        Finds a tunnel lying on a loop within the portion of the cavern system containing the starting cave.  Such a
+        tunnel is the first tunnel found by a depth first search that leads back to a cave already visited, other than
+        by the tunnel just taken.
+        :param caverns: list of sets of neighboring cave positions, indexed by cave position
+        :param start: position of a cave in the portion
+        :return: tuple containing the tunnel endpoints
+        """
+        parents = {start: None}
+        stack = [start]
+        while stack:
+            cave = stack.pop()
+            for neighboring_cave in caverns[cave]:
+                if neighboring_cave not in parents:
+                    parents[neighboring_cave] = cave
+                    stack.append(neighboring_cave)
+                elif neighboring_cave != parents[cave] and parents[neighboring_cave] != cave:
+                    return cave, neighboring_cave
+        raise ValueError("The portion of the cavern system contains no loop.")
 
     def get_cave(self, cave_id):
         """
         Returns the cave named tuple associated with the cave id provided if the cave id is valid (i.e., between 1
-        and 20 inclusive).  Otherwise the method returns None.
+        and the number of caves inclusive).  Otherwise the method returns None.
         :param cave_id: the cave id for which the cave named tuple is sought.
         :return: the appropriate cave named tuple, if found or None.
         """
-        if not (1 <= cave_id <= 20):
+        if not (1 <= cave_id < len(self.caves)):
             return None
-        return [cave for cave in self.cavern_system if cave.id == cave_id][0]
+        return self.caves[cave_id]
+
+    def get_neighboring_caves(self, cave_id):
+        """
+        Returns the set of ids of the caves neighboring the cave id provided.
+        :param cave_id: the cave id for which the neighboring caves are sought.
+        :return: frozen set of neighboring cave ids (empty if the cave id is not valid).
+        """
+        if not (1 <= cave_id < len(self.caves)):
+            return frozenset()
+        return self.neighboring_cave_sets[cave_id]
+
+    def are_neighbors(self, cave_id, other_cave_id):
+        """
+        Determines whether two caves are connected by a tunnel.
+        :param cave_id: id of one cave
+        :param other_cave_id: id of the other cave
+        :return: true if the caves neighbor one another and false otherwise.
+        """
+        return other_cave_id in self.get_neighboring_caves(cave_id)
+
+    def cave_ids(self, cave_mask):
+        """
+        Lists the ids of the caves in a bit mask of caves.
+        :param cave_mask: bit mask in which cave id n is bit n - 1
+        :return: sorted list of cave ids
+        """
+        cave_ids = []
+        while cave_mask:
+            lowest = cave_mask & -cave_mask
+            cave_ids.append(lowest.bit_length())
+            cave_mask ^= lowest
+        return cave_ids
+
+    @staticmethod
+    def nth_cave_id(index, cave_count, excluded_cave_ids=()):
+        """
+        Finds a cave id by its position, in ascending order, among the cave ids not excluded, without listing them.
+        Choosing a random position among cave_count - len(excluded_cave_ids) thus chooses a random cave from those
+        not excluded.
+        :param index: the position (0 based)
+        :param cave_count: number of caves
+        :param excluded_cave_ids: set of cave ids to pass over
+        :return: the cave id
+        """
+        cave_id = index + 1
+        for excluded_cave_id in sorted(excluded_cave_ids):
+            if excluded_cave_id <= cave_id:
+                cave_id += 1
+        if cave_id > cave_count:
+            raise ValueError(f"There are fewer than {index + 1} caves to choose from.")
+        return cave_id
 
 
 if __name__ == "__main__":
     # Direct call for debugging purposes.
-    random.seed(20)
-    cavern_system = CavernSystem()
+    cavern_system = CavernSystem(rng=random.Random(20))
     pprint.pprint(cavern_system.__str__())
@@ -1,9 +1,11 @@
 import random
 from collections import namedtuple
 
-from status_message import StatusMessage
+from pieces.cavern_system import CavernSystem
+from status_message import BOTTOMLESS_PIT_NEARBY, BOTTOMLESS_PIT_ENCOUNTERED, BAT_COLONY_NEARBY, \
+    BAT_COLONY_ENCOUNTERED
 
-Hazard_Perimeter = namedtuple("Hazard_Perimeter", ["warning", "included_caves"])
+Hazard_Perimeter = namedtuple("Hazard_Perimeter", ["warning", "cave_mask"])
 
 
 class Hazard:
@@ -11,29 +13,28 @@ class Hazard:
     A generic version of a hazard from which all game hazards descend.
     """
 
-    hazard_cave_ids = []
-
-    def __init__(self, cavern_system, cave_id):
+    def __init__(self, cavern_system, cave_id, rng=None):
         """
         Initialization of a generic hazard.  All hazards have at least a cave id and specific hazard subclasses must
         supply a hazard perimeter named tuple.
         :param cavern_system:  the layout of the cavern system
         :param cave_id: the id of the cave the hazard is currently found in.
+        :param rng: the game's random number generator, drawn from by hazards that behave randomly.
         """
         self.cave = cavern_system.get_cave(cave_id)
         self.cavern_system = cavern_system
+        self.rng = rng or random
         self.hazard_type = "UNKNOWN"
         self.hazard_perimeter = None
-        Hazard.hazard_cave_ids.append(cave_id)
 
     def issue_warning(self, hunter_cave_id):
         """
         Each hazard contains a Hazard_Perimeter named tuple that identified what caves are sufficiently proximate to
-        the hazard to warrant a warning.
+        the hazard to warrant a warning, as a bit mask of caves.
         :param hunter_cave_id: the hunter's location
         :return: hazard warning if the hunter is within range of the hazard and None otherwise.
         """
-        if hunter_cave_id in self.hazard_perimeter.included_caves:
+        if self.hazard_perimeter.cave_mask & self.cavern_system.cave_masks[hunter_cave_id]:
             return self.hazard_perimeter.warning
 
     def check_encounter(self, hunter, hazards=None):
@@ -47,7 +48,7 @@ class Hazard:
 
     def __str__(self):
         return f"{self.__class__.__name__} in cave {self.cave.id}." \
-               f"  Hazard perimeter: {self.hazard_perimeter.included_caves}."
+               f"  Hazard perimeter: {self.cavern_system.cave_ids(self.hazard_perimeter.cave_mask)}."
 
     def to_json(self):
         """
@@ -57,15 +58,16 @@ class Hazard:
         return self.cave.id
 
     @classmethod
-    def from_json(cls, cavern_system, json):
+    def from_json(cls, cavern_system, json, rng=None):
         """
         The cavern system and the json object containing the cave id is all that is needed to reconstitute the basic
         hazard in the proper state.
         :param cavern_system: the layout of the cavern system
         :param json: essentially, the id of the cave which the hazard currently occupies.
+        :param rng: the game's random number generator
         :return: the reconstituted Hazard object
         """
-        return cls(cavern_system, json)
+        return cls(cavern_system, json, rng)
 
 
 class BottomlessPit(Hazard):
@@ -74,12 +76,14 @@ class BottomlessPit(Hazard):
     cave removed from it.
     """
 
-    def __init__(self, cavern_system, cave_id):
-        super().__init__(cavern_system, cave_id)
+    WARNING = BOTTOMLESS_PIT_NEARBY
+
+    def __init__(self, cavern_system, cave_id, rng=None):
+        super().__init__(cavern_system, cave_id, rng)
         self.hazard_type = 'BOTTOMLESS_PIT'
         self.hazard_perimeter = Hazard_Perimeter(
-            [StatusMessage('WARNING', self.hazard_type, "You feel a draft")],
-            self.cave.neighboring_caves)
+            (BottomlessPit.WARNING,),
+            self.cavern_system.neighborhood_masks[self.cave.id])
 
     def check_encounter(self, hunter, hazards=None):
         """
@@ -91,8 +95,7 @@ class BottomlessPit(Hazard):
         """
         messages = []
         if hunter.cave.id == self.cave.id:
-            messages.extend(
-                [StatusMessage('TERMINAL', self.hazard_type, "You fell into a bottomless pit!")])
+            messages.append(BOTTOMLESS_PIT_ENCOUNTERED)
             messages.extend(hunter.killed())
         return messages
 
@@ -104,12 +107,14 @@ class BatColony(Hazard):
     s/he is no more than one cave removed from it.
     """
 
-    def __init__(self, cavern_system, cave_id):
-        super().__init__(cavern_system, cave_id)
+    WARNING = BAT_COLONY_NEARBY
+
+    def __init__(self, cavern_system, cave_id, rng=None):
+        super().__init__(cavern_system, cave_id, rng)
         self.hazard_type = 'BAT_COLONY'
         self.hazard_perimeter = Hazard_Perimeter(
-            [StatusMessage('WARNING', self.hazard_type, "You hear the flapping of wings")],
-            self.cave.neighboring_caves)
+            (BatColony.WARNING,),
+            self.cavern_system.neighborhood_masks[self.cave.id])
 
     def check_encounter(self, hunter, hazards=None):
         """
@@ -123,12 +128,9 @@ class BatColony(Hazard):
         """
         messages = []
         if hunter.cave.id == self.cave.id:
-            hunter_cave_id_options = [item for item in list(range(1, 21)) if item != self.cave.id]
-            new_cave_id = random.choice(hunter_cave_id_options)
-            messages.extend(
-                [StatusMessage('INFO', self.hazard_type,
-                               "You've stumbled into a bat colony.  "
-                               "Some of the bats are carrying you into another cave!")])
+            cave_count = self.cavern_system.cave_count
+            new_cave_id = CavernSystem.nth_cave_id(self.rng.randrange(cave_count - 1), cave_count, (self.cave.id,))
+            messages.append(BAT_COLONY_ENCOUNTERED)
             updated_status, _ = hunter.enter(new_cave_id, hazards, via_bat=True)
             messages.extend(updated_status)
         return messages
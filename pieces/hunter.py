@@ -1,4 +1,4 @@
-from status_message import StatusMessage
+from status_message import StatusMessage, HUNTER_KILLED, NO_ARROWS_LEFT
 from pieces.notebook import Notebook
 
 
@@ -6,7 +6,8 @@ class Hunter:
 
     ARROW_COUNT = 5
 
-    def __init__(self, cavern_system, cave_id, quiver=None, cavern_map=None, hazards=None):
+    def __init__(self, cavern_system, cave_id, quiver=None, cavern_map=None, hazards=None, map_positions=None,
+                 map_stamps=None, narrate=True, notebook=None):
         """
         Initialize the hunter.  Uses the cavern system to find the cave associated with the cave id.  The optional
         parameters are used when the hunter is being unmarshalled from the client-side session.
@@ -15,16 +16,32 @@ class Hunter:
         :param quiver: contains a limited number of arrows the hunter may use to kill the wumpus
         :param cavern_map: a map of the known portions of the cavern system
         :param hazards: list of hazards
+        :param map_positions: positions at which the caves of the cavern map were drawn on earlier turns
+        :param map_stamps: versions of the cavern map in which the depiction of each cave last changed
+        :param narrate: whether to provide the informational messages describing the hunter's progress.  Hazard
+        warnings and encounters are always reported.  Simulations forgo the narration.
+        :param notebook: function reconstituting the hunter's notebook, used in place of the cavern map, map positions
+        and map stamps when the hunter is being unmarshalled.  The notebook is then reconstituted only once consulted.
         """
         self.alive = True
-        self.quiver = quiver if quiver else Hunter.ARROW_COUNT
+        self.narrate = narrate
+        self.quiver = quiver if quiver is not None else Hunter.ARROW_COUNT
         self.cavern_system = cavern_system
         self.cave = self.cavern_system.get_cave(cave_id)
-        self.notebook = Notebook(cavern_map=cavern_map)
-        if not cavern_map and hazards:
+        self._notebook = notebook or Notebook(cavern_map=cavern_map, positions=map_positions, stamps=map_stamps)
+        if not cavern_map and not notebook and hazards:
             warnings = self.check_for_hazards(hazards)
             self.notebook.note_position(self.cave, warnings)
 
+    @property
+    def notebook(self):
+        """
+        The hunter's notebook, reconstituted on first use if need be.
+        """
+        if not isinstance(self._notebook, Notebook):
+            self._notebook = self._notebook()
+        return self._notebook
+
     def start_up(self, hazards):
         """
         Only called when the game is being initialized.  The hunter will not be placed with any hazards to begin with
@@ -33,7 +50,7 @@ class Hunter:
         :param hazards: list of game hazards
         :return: list of status messages
         """
-        messages = [StatusMessage('INFO', 'GENERAL', f"You are starting in cave {self.cave.id}")]
+        messages = [StatusMessage('INFO', 'GENERAL', f"You are starting in cave {self.cave.id}")] if self.narrate else []
         warnings = self.check_for_hazards(hazards)
         self.notebook.note_position(self.cave, warnings)
         messages.extend(warnings)
@@ -53,20 +70,21 @@ class Hunter:
         errors = []
 
         # The hunter may only enter a cave adjoining the one s/he came from unless transported via a bat.
-        if cave_id in self.cave.neighboring_caves or via_bat:
+        if via_bat or self.cavern_system.are_neighbors(self.cave.id, cave_id):
 
             # Identify the new cave
             self.cave = self.cavern_system.get_cave(cave_id)
 
             # Provide informational messages appropriate to the circumstance.
-            if via_bat:
-                status.extend([StatusMessage('INFO', 'BAT_COLONY',
-                                             f"You are being dropped into cave {cave_id}")])
-            else:
-                status.extend([StatusMessage('INFO', 'GENERAL',
-                                             f"You are moving into cave {cave_id}")])
+            if self.narrate:
+                if via_bat:
+                    status.extend([StatusMessage('INFO', 'BAT_COLONY',
+                                                 f"You are being dropped into cave {cave_id}")])
+                else:
+                    status.extend([StatusMessage('INFO', 'GENERAL',
+                                                 f"You are moving into cave {cave_id}")])
 
-            status.extend([StatusMessage('INFO', 'GENERAL', f"{self}")])
+                status.extend([StatusMessage('INFO', 'GENERAL', f"{self}")])
 
             wumpus = [hazard for hazard in hazards if hazard.hazard_type == 'WUMPUS'][0]
             wumpus.move()
@@ -105,7 +123,8 @@ class Hunter:
         errors = []
 
         # Orientation message for the hunter (although s/he did not move)
-        messages.extend([StatusMessage('INFO', 'GENERAL', f"{self}")])
+        if self.narrate:
+            messages.extend([StatusMessage('INFO', 'GENERAL', f"{self}")])
 
         # Must have an arrow left to shoot in the first place.
         if self.quiver > 0:
@@ -116,9 +135,10 @@ class Hunter:
 
             # Spend the arrow and provide a message to that effect
             self.quiver -= 1
-            messages.extend([StatusMessage('INFO', 'GENERAL',
-                                           f"You've shot an arrow into {cave_id}.  "
-                                           f"You have {self.quiver} arrows remaining.")])
+            if self.narrate:
+                messages.extend([StatusMessage('INFO', 'GENERAL',
+                                               f"You've shot an arrow into {cave_id}.  "
+                                               f"You have {self.quiver} arrows remaining.")])
 
             # The wumpus may react to the shot in one of two ways.  It either dies or it wakes up (if not already
             # awake) and starts hunting the hunter
@@ -129,8 +149,7 @@ class Hunter:
 
                 # Since the Wumpus is still alive, exhausting one's supply of arrows is really a death sentence.
                 if self.quiver == 0:
-                    messages.extend([StatusMessage('WARNING', 'GENERAL',
-                                                   "You have no arrows left.  All you can do is avoid the wumpus.")])
+                    messages.append(NO_ARROWS_LEFT)
 
                 # This actually caused the Wumpus to move only if the Wumpus if awake.  Wumpus's do not walk in their
                 # sleep.
@@ -147,8 +166,7 @@ class Hunter:
                     messages.extend(warnings)
                     self.notebook.note_position(self.cave, warnings, not wumpus.asleep)
         else:
-            messages.extend([StatusMessage('WARNING', 'GENERAL',
-                                           "You have no arrows left.  All you can do is avoid the wumpus.")])
+            messages.append(NO_ARROWS_LEFT)
         return messages, errors
 
     def killed(self):
@@ -157,7 +175,7 @@ class Hunter:
         :return: list of a single status message indicating the demise of the hunter.
         """
         self.alive = False
-        return [StatusMessage('TERMINAL', 'GENERAL', "You've been killed.  Sorry.")]
+        return [HUNTER_KILLED]
 
     def check_for_hazards(self, hazards):
         """
@@ -201,7 +219,9 @@ class Hunter:
         return {
             "cave_id": self.cave.id,
             "quiver": self.quiver,
-            "cavern_map": self.notebook.to_json()
+            "cavern_map": self.notebook.to_json(),
+            "map_positions": self.notebook.positions_to_json(),
+            "map_stamps": self.notebook.stamps_to_json()
         }
 
     @staticmethod
@@ -215,5 +235,6 @@ class Hunter:
         return Hunter(cavern_system=cavern_system,
                       cave_id=json.get("cave_id"),
                       quiver=json.get("quiver"),
-                      cavern_map=Notebook.from_json(cavern_system, json.get("cavern_map")),
-                      hazards=None)
+                      notebook=lambda: Notebook(cavern_map=Notebook.from_json(cavern_system, json.get("cavern_map")),
+                                                positions=Notebook.positions_from_json(json.get("map_positions")),
+                                                stamps=Notebook.stamps_from_json(json.get("map_stamps"))))
@@ -0,0 +1,161 @@
+import hashlib
+import os
+import tempfile
+import threading
+from collections import OrderedDict
+
+
+class MapCache:
+    """
+    A bounded, least recently used cache of rendered cavern maps.  Maps are keyed by a hash of the notebook's contents
+    so that an unchanged notebook (e.g., after a missed shot) or an identical notebook belonging to another player is
+    never rendered twice.  The cache may optionally be backed by a directory of files so that worker processes can
+    share their renderings.
+    """
+
+    # The shared directory is pruned back to its maximum size after this many writes by a given process.
+    PRUNE_INTERVAL = 64
+
+    # The statistics of the cache exposed as metrics (see metrics.Collector).
+    METRICS = [("hits", "wumpus_map_cache_hits_total", "counter", "Cavern maps found in the map cache."),
+               ("misses", "wumpus_map_cache_misses_total", "counter", "Cavern maps not found in the map cache."),
+               ("size", "wumpus_map_cache_maps", "gauge", "Cavern maps held in memory by the map cache.")]
+
+    def __init__(self, maxsize=256, directory=None):
+        """
+        Initializes the cache.
+        :param maxsize: the maximum number of maps held in memory (and on disk, if shared).  Zero disables caching.
+        :param directory: optional directory shared with other worker processes in which to store rendered maps.
+        """
+        self.maxsize = maxsize
+        self.directory = directory
+        self.maps = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    @staticmethod
+    def key(renderer_name, cavern_map, current_cave_id, positions=None):
+        """
+        Provides a canonical hash of everything that figures into a rendering - the renderer, the hunter's location,
+        for each mapped site, in the order noted, its cave id, its neighboring caves and its warning flags
+        and finally, the positions at which the caves are drawn.
+        :param renderer_name: name of the renderer drawing the map
+        :param cavern_map: list of mapped sites noted by the hunter
+        :param current_cave_id: where the hunter is currently located.
+        :param positions: dictionary of cave id to the position at which it is drawn, if the renderer keeps positions
+        :return: hexadecimal digest identifying the rendering
+        """
+        contents = (renderer_name,
+                    current_cave_id,
+                    tuple((mapped_site.cave.id,
+                           tuple(mapped_site.cave.neighboring_caves),
+                           mapped_site.warnings)
+                          for mapped_site in cavern_map),
+                    tuple(sorted((positions or {}).items())))
+        return hashlib.blake2b(repr(contents).encode(), digest_size=16).hexdigest()
+
+    def get(self, key):
+        """
+        Retrieves a rendered map from memory or, failing that, from the shared directory.
+        :param key: the hash identifying the rendering
+        :return: the svg based cavern map or None if not cached
+        """
+        with self.lock:
+            svg = self.maps.get(key)
+            if svg is not None:
+                self.maps.move_to_end(key)
+                self.hits += 1
+                return svg
+        svg = self.read(key)
+        with self.lock:
+            if svg is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.remember(key, svg)
+        return svg
+
+    def put(self, key, svg):
+        """
+        Adds a rendered map to the cache, evicting the least recently used map if the cache is full.
+        :param key: the hash identifying the rendering
+        :param svg: the svg based cavern map
+        """
+        if not self.maxsize:
+            return
+        with self.lock:
+            self.remember(key, svg)
+        self.write(key, svg)
+
+    def remember(self, key, svg):
+        """
+        Holds the rendered map in memory.  The caller must hold the lock.
+        """
+        if not self.maxsize:
+            return
+        self.maps[key] = svg
+        self.maps.move_to_end(key)
+        while len(self.maps) > self.maxsize:
+            self.maps.popitem(last=False)
+
+    def read(self, key):
+        """
+        Reads a rendered map from the shared directory, if any.  Reading a map marks it as recently used.
+        """
+        if not self.directory or not self.maxsize:
+            return None
+        path = os.path.join(self.directory, f"{key}.svg")
+        try:
+            with open(path, encoding="utf-8") as svg_file:
+                svg = svg_file.read()
+            os.utime(path)
+            return svg
+        except OSError:
+            return None
+
+    def write(self, key, svg):
+        """
+        Writes a rendered map to the shared directory, if any.  The map is written to a temporary file and then
+        moved into place so that other processes never read a partial map.
+        """
+        if not self.directory:
+            return
+        file_descriptor, temporary_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        with os.fdopen(file_descriptor, "w", encoding="utf-8") as svg_file:
+            svg_file.write(svg)
+        os.replace(temporary_path, os.path.join(self.directory, f"{key}.svg"))
+        with self.lock:
+            self.writes += 1
+            prune = self.writes % MapCache.PRUNE_INTERVAL == 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        """
+        Removes the least recently used maps from the shared directory until no more than maxsize remain.
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".svg"):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    continue
+        entries.sort()
+        for _, path in entries[:max(len(entries) - self.maxsize, 0)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def stats(self):
+        """
+        Reports the cache's effectiveness.
+        :return: dictionary of hit and miss counts along with the number of maps held in memory
+        """
+        with self.lock:
+            return {"hits": self.hits, "misses": self.misses, "size": len(self.maps), "maxsize": self.maxsize}
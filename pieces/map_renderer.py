@@ -0,0 +1,329 @@
+from math import sqrt
+from xml.sax.saxutils import escape, quoteattr
+
+from pieces.warning_flags import warning_sources
+
+try:
+    from graphviz import Graph
+except ImportError:
+    Graph = None
+
+
+class MapRenderer:
+    """
+    A generic version of a cavern map renderer from which all renderers descend.  A renderer turns the hunter's
+    field notes (the mapped sites and the tunnels between them) into an svg image of the explored caves.
+    """
+
+    name = "UNKNOWN"
+
+    def arrange(self, cavern_map, tunnels, positions):
+        """
+        Renderers that lay out the map themselves assign positions to caves not yet positioned, leaving the positions
+        of caves laid out on previous turns untouched.  By default, no positions are kept.
+        :param cavern_map: list of mapped sites noted by the hunter
+        :param tunnels: set of tuples containing the tunnel endpoints
+        :param positions: dictionary of cave id to position, updated in place
+        """
+
+    def render(self, cavern_map, tunnels, current_cave_id, positions=None):
+        """
+        Each renderer implements the conversion of the field notes into an svg document.
+        :param cavern_map: list of mapped sites noted by the hunter
+        :param tunnels: set of tuples containing the tunnel endpoints
+        :param current_cave_id: where the hunter is currently located.
+        :param positions: dictionary of cave id to position as arranged previously
+        :return: string representation of the svg based cavern map
+        """
+        raise NotImplementedError
+
+    def render_changes(self, cavern_map, tunnels, current_cave_id, positions, cave_ids):
+        """
+        Renderers whose maps are drawn from independent pieces may render only the pieces that changed, so that a
+        browser holding an earlier rendering can patch it rather than replace it.  By default, changes cannot be
+        rendered and the whole map must be rendered instead.
+        :param cavern_map: list of mapped sites noted by the hunter
+        :param tunnels: set of tuples containing the tunnel endpoints
+        :param current_cave_id: where the hunter is currently located.
+        :param positions: dictionary of cave id to position as arranged previously
+        :param cave_ids: ids of the caves whose depiction changed
+        :return: the patch or None if the renderer cannot render changes
+        """
+        return None
+
+    @staticmethod
+    def describe_site(mapped_site, current_cave_id):
+        """
+        Provides the label, outline color and tooltip used to depict a mapped site.  Sites from which a hazard was
+        detected are outlined in yellow and the others in green.  The hunter's current location is starred.
+        :param mapped_site: the mapped site named tuple
+        :param current_cave_id: where the hunter is currently located.
+        :return: tuple of label, color and tooltip
+        """
+        color = 'yellow' if mapped_site.warnings else 'green'
+        sources = ",".join(warning_sources(mapped_site.warnings))
+        current_location = '*' if mapped_site.cave.id == current_cave_id else ''
+        return f'{mapped_site.cave.id} {current_location}', color, sources
+
+
+class GraphvizRenderer(MapRenderer):
+    """
+    Renders the cavern map using the graphviz package.  Note that graphviz runs the external dot program for every
+    map rendered, so this renderer is only available when both the graphviz package and the graphviz binaries are
+    installed.
+    """
+
+    name = "graphviz"
+
+    def __init__(self):
+        if Graph is None:
+            raise RuntimeError("The graphviz renderer requires the graphviz package to be installed.")
+
+    def render(self, cavern_map, tunnels, current_cave_id, positions=None):
+        dot = Graph(comment='Your notebook - explored caves')
+        for mapped_cave in cavern_map:
+            label, color, warning_sources = MapRenderer.describe_site(mapped_cave, current_cave_id)
+            dot.attr('node', color=color)
+            dot.node(f'{mapped_cave.cave.id}', label, _attributes=[('tooltip', f'{warning_sources}')])
+        for tunnel in tunnels:
+            dot.attr('node', color='black')
+            dot.edge(f'{tunnel[0]}', f'{tunnel[1]}')
+        svg_data = dot.pipe(format='svg')
+        return "".join(chr(datum) for datum in svg_data)
+
+
+class SvgRenderer(MapRenderer):
+    """
+    Renders the cavern map in process without resorting to any external program.  The caves are laid out in ranks
+    according to their distance (in tunnels) from the first cave noted, much as graphviz' dot would lay them out, and
+    the svg produced mimics the structure and default dimensions of the svg graphviz produces.  Caves keep their
+    positions from turn to turn so that only newly discovered caves need to be placed and the map does not jump about.
+    Since caves are drawn at fixed coordinates (the graph as a whole is translated to fit the image), the svg for a
+    cave or tunnel never changes unless its depiction does, which allows the map to be patched piece by piece.
+    """
+
+    name = "builtin"
+
+    # Graphviz defaults (in points) - node width of 0.75in, node height of 0.5in, nodesep of 0.25in, ranksep of 0.5in
+    NODE_RX = 27
+    NODE_RY = 18
+    COLUMN_WIDTH = 72
+    RANK_HEIGHT = 72
+    MARGIN = 4
+
+    def arrange(self, cavern_map, tunnels, positions):
+        cave_ids = [mapped_site.cave.id for mapped_site in cavern_map]
+        mapped_cave_ids = set(cave_ids)
+        cave_ids.extend(sorted({cave_id for tunnel in tunnels for cave_id in tunnel} - mapped_cave_ids))
+        SvgRenderer.place(cave_ids, tunnels, positions)
+
+    def render(self, cavern_map, tunnels, current_cave_id, positions=None):
+        if positions is None:
+            positions = {}
+            self.arrange(cavern_map, tunnels, positions)
+        nodes = SvgRenderer.collect_nodes(cavern_map, tunnels, current_cave_id)
+        return self.draw(nodes, tunnels, positions)
+
+    def render_changes(self, cavern_map, tunnels, current_cave_id, positions, cave_ids):
+        """
+        Renders the frame of the map (its dimensions and the translation of the graph) along with the changed caves
+        and the tunnels leading to them.  Each piece is an svg fragment carrying the same id as the element it
+        replaces in an earlier rendering or, if new, is to be added to the graph.
+        :return: dictionary of the frame attributes and the list of svg fragments
+        """
+        nodes = [node for node in SvgRenderer.collect_nodes(cavern_map, tunnels, current_cave_id)
+                 if node[0] in cave_ids]
+        changed_tunnels = [tunnel for tunnel in sorted(tunnels) if tunnel[0] in cave_ids or tunnel[1] in cave_ids]
+        return {**self.frame(positions),
+                "elements": [self.draw_node(node, positions) for node in nodes]
+                + [self.draw_tunnel(tunnel, positions) for tunnel in changed_tunnels]}
+
+    @staticmethod
+    def collect_nodes(cavern_map, tunnels, current_cave_id):
+        """
+        Assembles the nodes to depict.  The mapped sites come first, in the order in which they were noted.  Caves
+        discovered at the far end of a tunnel but not yet entered follow, outlined in black as graphviz does for nodes
+        only implied by an edge.
+        :param cavern_map: list of mapped sites noted by the hunter
+        :param tunnels: set of tuples containing the tunnel endpoints
+        :param current_cave_id: where the hunter is currently located.
+        :return: list of tuples of cave id, label, color and tooltip
+        """
+        nodes = []
+        for mapped_site in cavern_map:
+            nodes.append((mapped_site.cave.id, *MapRenderer.describe_site(mapped_site, current_cave_id)))
+        mapped_cave_ids = {node[0] for node in nodes}
+        discovered_cave_ids = {cave_id for tunnel in tunnels for cave_id in tunnel} - mapped_cave_ids
+        nodes.extend((cave_id, f'{cave_id}', 'black', '') for cave_id in sorted(discovered_cave_ids))
+        return nodes
+
+    @staticmethod
+    def place(cave_ids, tunnels, positions):
+        """
+        Assigns a (column, rank) position to each cave lacking one.  A cave adjoining caves already placed goes one
+        rank below the highest of them, in the free column nearest their average column.  Since a bat colony may drop
+        the hunter into an unconnected part of the cavern system, a cave with no placed neighbor starts a new portion
+        of the map at the top rank, to the right of everything placed so far.  Caves placed previously are never
+        moved, so the layout effort is proportional to the number of newly discovered caves.
+        :param cave_ids: ids of the caves to lay out in order of precedence
+        :param tunnels: set of tuples containing the tunnel endpoints
+        :param positions: dictionary of cave id to (column, rank) tuple, updated in place
+        """
+        pending = [cave_id for cave_id in cave_ids if cave_id not in positions]
+        if not pending:
+            return
+        pending_cave_ids = set(pending)
+        adjacent_caves = {cave_id: [] for cave_id in pending}
+        for tunnel in tunnels:
+            if tunnel[0] in pending_cave_ids:
+                adjacent_caves[tunnel[0]].append(tunnel[1])
+            if tunnel[1] in pending_cave_ids:
+                adjacent_caves[tunnel[1]].append(tunnel[0])
+        occupied = set(positions.values())
+
+        while pending:
+            # Place those caves adjoining caves already placed before falling back on starting a new portion.
+            deferred = []
+            for cave_id in pending:
+                placed_neighbors = [positions[adjacent_cave] for adjacent_cave in adjacent_caves[cave_id]
+                                    if adjacent_cave in positions]
+                if not placed_neighbors:
+                    deferred.append(cave_id)
+                    continue
+                rank = min(position[1] for position in placed_neighbors) + 1
+                column = round(sum(position[0] for position in placed_neighbors) / len(placed_neighbors))
+                positions[cave_id] = SvgRenderer.free_position(column, rank, occupied)
+                occupied.add(positions[cave_id])
+            if len(deferred) == len(pending):
+                column = max((position[0] for position in occupied), default=-1) + 1
+                positions[deferred[0]] = (column, 0)
+                occupied.add(positions[deferred[0]])
+                deferred.pop(0)
+            pending = deferred
+
+    @staticmethod
+    def free_position(column, rank, occupied):
+        """
+        Finds the unoccupied column of the given rank that is nearest the desired column.
+        """
+        offset = 0
+        while True:
+            for candidate in (column + offset, column - offset):
+                if (candidate, rank) not in occupied:
+                    return candidate, rank
+            offset += 1
+
+    def center(self, position):
+        """
+        Converts a (column, rank) position into the coordinates of a node's center.  As with graphviz, the y
+        coordinates are negative since the graph is translated to the bottom of the image.
+        """
+        return (self.NODE_RX + position[0] * self.COLUMN_WIDTH,
+                -(self.NODE_RY + position[1] * self.RANK_HEIGHT))
+
+    @staticmethod
+    def bounds(positions):
+        """
+        Identifies the leftmost and rightmost columns and the topmost and bottommost ranks in use.
+        :return: tuple of the origin (leftmost column, topmost rank) and the extent (rightmost column, bottommost rank)
+        """
+        if not positions:
+            return (0, 0), (0, 0)
+        columns = [position[0] for position in positions.values()]
+        ranks = [position[1] for position in positions.values()]
+        return (min(columns), min(ranks)), (max(columns), max(ranks))
+
+    def size(self, origin, extent):
+        """
+        Width and height of the graph proper (exclusive of the margin) needed to accommodate all positions.
+        """
+        return (2 * self.NODE_RX + (extent[0] - origin[0]) * self.COLUMN_WIDTH,
+                2 * self.NODE_RY + (extent[1] - origin[1]) * self.RANK_HEIGHT)
+
+    def frame(self, positions):
+        """
+        Determines the dimensions of the image and the translation that brings the leftmost column and the topmost
+        rank in use to the margin of the image.
+        :param positions: dictionary of cave id to (column, rank) tuple
+        :return: dictionary of the width, height and viewBox attributes of the svg document, the transform attribute
+        of the graph and the points of the white background polygon (in the coordinates of the graph)
+        """
+        origin, extent = SvgRenderer.bounds(positions)
+        width, height = self.size(origin, extent)
+        outer_width, outer_height = width + 2 * self.MARGIN, height + 2 * self.MARGIN
+        dx, dy = origin[0] * self.COLUMN_WIDTH, origin[1] * self.RANK_HEIGHT
+        left, right = dx - self.MARGIN, dx + width + self.MARGIN
+        bottom, top = self.MARGIN - dy, -height - self.MARGIN - dy
+        return {"width": f"{outer_width:.0f}pt",
+                "height": f"{outer_height:.0f}pt",
+                "viewBox": f"0.00 0.00 {outer_width:.2f} {outer_height:.2f}",
+                "transform": f"translate({self.MARGIN - dx} {outer_height - self.MARGIN + dy:.2f})",
+                "background": f"{left},{bottom} {left},{top:.2f} {right:.2f},{top:.2f} {right:.2f},{bottom} "
+                              f"{left},{bottom}"}
+
+    def draw(self, nodes, tunnels, positions):
+        """
+        Serializes the laid out nodes and tunnels into an svg document.
+        :param nodes: list of tuples of cave id, label, color and tooltip
+        :param tunnels: set of tuples containing the tunnel endpoints
+        :param positions: dictionary of cave id to (column, rank) tuple
+        :return: the svg document as a string
+        """
+        frame = self.frame(positions)
+        svg = [f'<svg width="{frame["width"]}" height="{frame["height"]}" viewBox="{frame["viewBox"]}" '
+               f'xmlns="http://www.w3.org/2000/svg" xmlns:xlink="http://www.w3.org/1999/xlink">',
+               f'<g id="graph0" class="graph" transform="{frame["transform"]}">',
+               '<title>%3</title>',
+               f'<polygon fill="white" stroke="transparent" points="{frame["background"]}"/>']
+        svg.extend(self.draw_node(node, positions) for node in nodes)
+        svg.extend(self.draw_tunnel(tunnel, positions) for tunnel in sorted(tunnels))
+        svg.append('</g>\n</svg>\n')
+        return "\n".join(svg)
+
+    def draw_node(self, node, positions):
+        """
+        Serializes a single cave as an svg group containing an outlined ellipse and its label.  A tooltip listing any
+        warning sources is attached when warnings exist.
+        :param node: tuple of cave id, label, color and tooltip
+        :param positions: dictionary of cave id to (column, rank) tuple
+        :return: svg fragment for the cave
+        """
+        cave_id, label, color, tooltip = node
+        cx, cy = self.center(positions[cave_id])
+        shape = (f'<ellipse fill="none" stroke="{color}" cx="{cx:.2f}" cy="{cy:.2f}" '
+                 f'rx="{self.NODE_RX}" ry="{self.NODE_RY}"/>\n'
+                 f'<text text-anchor="middle" x="{cx:.2f}" y="{cy + 3.7:.2f}" '
+                 f'font-family="Times,serif" font-size="14.00">{escape(label)}</text>')
+        if tooltip:
+            shape = f'<g id="a_node{cave_id}"><a xlink:title={quoteattr(tooltip)}>\n{shape}\n</a>\n</g>'
+        return f'<g id="node{cave_id}" class="node">\n<title>{cave_id}</title>\n{shape}\n</g>'
+
+    def draw_tunnel(self, tunnel, positions):
+        """
+        Serializes a single tunnel as a straight line running between the outlines of the two caves it joins.
+        :param tunnel: tuple containing the tunnel endpoints
+        :param positions: dictionary of cave id to (column, rank) tuple
+        :return: svg fragment for the tunnel
+        """
+        (x1, y1), (x2, y2) = self.center(positions[tunnel[0]]), self.center(positions[tunnel[1]])
+        dx, dy = x2 - x1, y2 - y1
+        clip = 1 / sqrt((dx / self.NODE_RX) ** 2 + (dy / self.NODE_RY) ** 2)
+        start = (x1 + dx * clip, y1 + dy * clip)
+        end = (x2 - dx * clip, y2 - dy * clip)
+        return (f'<g id="edge{tunnel[0]}_{tunnel[1]}" class="edge">\n<title>{tunnel[0]}&#45;&#45;{tunnel[1]}</title>\n'
+                f'<path fill="none" stroke="black" d="M{start[0]:.2f},{start[1]:.2f}L{end[0]:.2f},{end[1]:.2f}"/>\n'
+                f'</g>')
+
+
+RENDERERS = {renderer.name: renderer for renderer in [SvgRenderer, GraphvizRenderer]}
+
+
+def get_renderer(name):
+    """
+    Provides a renderer by name.
+    :param name: builtin or graphviz
+    :return: an instance of the renderer named
+    """
+    if name not in RENDERERS:
+        raise ValueError(f"Unknown map renderer {name}.  Choose one of {', '.join(RENDERERS)}.")
+    return RENDERERS[name]()
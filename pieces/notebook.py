@@ -1,11 +1,18 @@
 from collections import namedtuple
 
-from graphviz import Graph
-
+from pieces.map_cache import MapCache
+from pieces.map_renderer import SvgRenderer
+from pieces.warning_flags import WUMPUS_WARNING, warning_flags, warning_sources
 from status_message import StatusMessage
 
+# The warnings noted at a mapped site are held as warning flags.
 Mapped_Site = namedtuple("Mapped_Site", ["cave", "warnings"])
 
+# The depiction of a cave on the cavern map is summarized in flags: the warning flags of the cave, whether the cave has
+# been visited rather than merely discovered and whether the hunter is there.
+MAPPED_SITE = 0x20
+CURRENT_CAVE = 0x40
+
 
 class Notebook:
     """
@@ -13,51 +20,126 @@ class Notebook:
     hazards were detected from therein and what additional caves were discovered on the periphery.
     """
 
-    def __init__(self, cavern_map=None):
-        if cavern_map:
-            self.cavern_map = cavern_map
-        else:
-            self.cavern_map = []
+    # The renderer used to draw the cavern map.  May be replaced with another renderer via configuration.
+    renderer = SvgRenderer()
+
+    # Renderings are cached by notebook contents.  May be replaced with a differently sized or shared cache.
+    cache = MapCache()
+
+    def __init__(self, cavern_map=None, positions=None, stamps=None):
+        """
+        Initializes or reconstitutes the notebook.  The mapped sites are indexed by cave id, in the order in which
+        they were last noted, and the tunnels leading from them are kept up to date as sites are noted, so noting a
+        site takes constant time.
+        :param cavern_map: list of mapped sites noted thus far
+        :param positions: dictionary of cave id to the position at which the cave was drawn on earlier turns
+        :param stamps: dictionary of cave id to a tuple of the version of the cavern map in which the cave's depiction
+        last changed and the flags summarizing that depiction
+        """
+        self.cavern_map = {mapped_site.cave.id: mapped_site for mapped_site in cavern_map or []}
+        self.tunnels = set()
+        for mapped_site in self.cavern_map.values():
+            self.add_tunnels(mapped_site.cave)
+
+        # Ids of the caves whose mapped sites carry a Wumpus warning.
+        self.wumpus_warnings = {cave_id for cave_id, mapped_site in self.cavern_map.items()
+                                if mapped_site.warnings & WUMPUS_WARNING}
+        self.positions = positions if positions else {}
+        self.stamps = stamps if stamps else {}
+
+        # The version of the cavern map is bumped whenever the depiction of any cave changes.
+        self.version = max((stamp for stamp, _ in self.stamps.values()), default=0)
 
     def consult_notebook(self, current_cave_id):
         """
         Produces an svg representation of the explored portions of the cavern system along with warnings relevant to
-        certain caves.
+        certain caves.  The map is drawn by the notebook's renderer, which is the in-process renderer unless another
+        (e.g., graphviz) is configured.  Caves drawn on earlier turns keep their positions so only caves discovered
+        since the last turn are laid out.  A notebook whose contents were rendered before is served from the cache.
         :param: current_cave_id - where the hunter is currently located.
-        :return: string reprsentation of svg based cavern map (using graphviz)
+        :return: string reprsentation of svg based cavern map
+        """
+        tunnels = self.prepare(current_cave_id)
+        cavern_map = self.cavern_map.values()
+        key = MapCache.key(Notebook.renderer.name, cavern_map, current_cave_id, self.positions)
+        svg = Notebook.cache.get(key)
+        if svg is None:
+            svg = Notebook.renderer.render(cavern_map, tunnels, current_cave_id, self.positions)
+            Notebook.cache.put(key, svg)
+        return svg
+
+    def consult_notebook_changes(self, current_cave_id, since_version):
+        """
+        Produces a patch bringing a cavern map rendered at an earlier version up to date.  The patch contains only the
+        caves whose depiction changed since that version, along with the tunnels leading to them.
+        :param current_cave_id: where the hunter is currently located.
+        :param since_version: the version of the cavern map held by the browser
+        :return: the patch or None if the whole map must be rendered instead (the renderer cannot patch or the version
+        is unknown or not a version at all)
+        """
+        tunnels = self.prepare(current_cave_id)
+        if not isinstance(since_version, int) or isinstance(since_version, bool) \
+                or not 0 < since_version <= self.version:
+            return None
+        cave_ids = {cave_id for cave_id, (stamp, _) in self.stamps.items() if stamp > since_version}
+        return Notebook.renderer.render_changes(self.cavern_map.values(), tunnels, current_cave_id, self.positions,
+                                                cave_ids)
+
+    def map_data(self, current_cave_id):
+        """
+        Provides the explored portions of the cavern system as structured data for the browser to lay out and draw
+        itself.  The mapped sites come first, in the order in which they were noted, followed by the caves discovered
+        at the far end of a tunnel but not yet entered.
+        :param current_cave_id: where the hunter is currently located.
+        :return: json compatible dictionary of the caves (id, whether visited, whether the hunter is there and the
+        sources of the warnings noted there) and the tunnels (pairs of cave ids)
+        """
+        tunnels = self.find_tunnels()
+        caves = [{"id": mapped_site.cave.id,
+                  "visited": True,
+                  "current": mapped_site.cave.id == current_cave_id,
+                  "warnings": warning_sources(mapped_site.warnings)}
+                 for mapped_site in self.cavern_map.values()]
+        discovered_cave_ids = {cave_id for tunnel in tunnels for cave_id in tunnel} - self.cavern_map.keys()
+        caves.extend({"id": cave_id, "visited": False, "current": False, "warnings": []}
+                     for cave_id in sorted(discovered_cave_ids))
+        return {"caves": caves, "tunnels": sorted(tunnels)}
+
+    def prepare(self, current_cave_id):
+        """
+        Lays out any newly discovered caves and stamps the caves whose depiction changed with a new version of the
+        cavern map.
+        :param current_cave_id: where the hunter is currently located.
+        :return: set of tuples containing the tunnel endpoints.
         """
         tunnels = self.find_tunnels()
-        dot = Graph(comment='Your notebook - explored caves')
-        for mapped_cave in self.cavern_map:
-            warning_sources = ""
-            if mapped_cave.warnings:
-                dot.attr('node', color='yellow')
-                warning_sources = ",".join([warning.source for warning in mapped_cave.warnings])
-            else:
-                dot.attr('node', color='green')
-            current_location = '*' if mapped_cave.cave.id == current_cave_id else ''
-            dot.node(f'{mapped_cave.cave.id}',
-                     f'{mapped_cave.cave.id} {current_location}',
-                     _attributes=[('tooltip', f'{warning_sources}')])
-        for tunnel in tunnels:
-            dot.attr('node', color='black')
-            dot.edge(f'{tunnel[0]}', f'{tunnel[1]}')
-        svg_data = dot.pipe(format='svg')
-        return "".join(chr(datum) for datum in svg_data)
+        Notebook.renderer.arrange(self.cavern_map.values(), tunnels, self.positions)
+        flags = {cave_id: 0 for tunnel in tunnels for cave_id in tunnel}
+        for cave_id, mapped_site in self.cavern_map.items():
+            flags[cave_id] = mapped_site.warnings | MAPPED_SITE | (CURRENT_CAVE if cave_id == current_cave_id else 0)
+        changes = [cave_id for cave_id, cave_flags in flags.items()
+                   if cave_id not in self.stamps or self.stamps[cave_id][1] != cave_flags]
+        if changes:
+            self.version += 1
+            for cave_id in changes:
+                self.stamps[cave_id] = (self.version, flags[cave_id])
+        return tunnels
 
     def find_tunnels(self):
         """
-        Identifies the tunnels that exist between each cave and its three neighbors.  This will insure that even
+        Identifies the tunnels that exist between each mapped cave and its neighbors.  This will insure that even
         those caves that the hunter has discovered but not yet attempted to occupy are included in the map.
         :return: set of tuples containing the tunnel endpoints.
         """
-        tunnels = set()
-        for mapped_site in self.cavern_map:
-            for neighboring_cave in mapped_site.cave.neighboring_caves:
-                tunnel = (mapped_site.cave.id, neighboring_cave)\
-                    if mapped_site.cave.id < neighboring_cave else (neighboring_cave, mapped_site.cave.id)
-                tunnels.add(tunnel)
-        return tunnels
+        return self.tunnels
+
+    def add_tunnels(self, cave):
+        """
+        Adds the tunnels leading from a newly mapped cave.
+        :param cave: the cave
+        """
+        for neighboring_cave in cave.neighboring_caves:
+            self.tunnels.add((cave.id, neighboring_cave) if cave.id < neighboring_cave else (neighboring_cave, cave.id))
 
     def note_position(self, cave, warnings, wumpus_moving=False):
         """
@@ -70,21 +152,25 @@ class Notebook:
         """
 
         # Previous indications of the presence of the wumpus are no longer reliable and potentially misleading since
-        # the wumpus is now moving.
+        # the wumpus is now moving.  Once the wumpus moves, these are cleared on every turn, so only the site noted on
+        # the previous turn can carry one.
         if wumpus_moving:
-            for mapped_site in self.cavern_map:
-                old_wumpus_warning = [warning for warning in mapped_site.warnings if warning.source == 'WUMPUS']
-                if old_wumpus_warning:
-                    mapped_site.warnings.remove(old_wumpus_warning[0])
+            for cave_id in self.wumpus_warnings:
+                mapped_site = self.cavern_map[cave_id]
+                self.cavern_map[cave_id] = mapped_site._replace(warnings=mapped_site.warnings & ~WUMPUS_WARNING)
+            self.wumpus_warnings.clear()
 
-        # Avoid adding duplicates if the hunter backtracks.  If the wumpus is moving about the newer version of the
-        # mapped site may contain a warning about the wumpus's proximity.  So we remove the original version in
-        # favor of the newer version.
-        for mapped_site in self.cavern_map:
-            if cave.id == mapped_site.cave.id:
-                self.cavern_map.remove(mapped_site)
+        # If the hunter backtracks, the newer version of the mapped site replaces the original version and is moved
+        # to the end of the map, as the site most recently noted.
+        if cave.id in self.cavern_map:
+            del self.cavern_map[cave.id]
+        else:
+            self.add_tunnels(cave)
 
-        self.cavern_map.append(Mapped_Site(cave, warnings))
+        flags = warning_flags(warnings)
+        self.cavern_map[cave.id] = Mapped_Site(cave, flags)
+        if flags & WUMPUS_WARNING:
+            self.wumpus_warnings.add(cave.id)
 
     def to_json(self):
         """
@@ -92,13 +178,10 @@ class Notebook:
         :return: json compatible array containing json compatible dictionaries of the mapped site named tuples.
         """
         json_array = []
-        for mapped_site in self.cavern_map:
+        for mapped_site in self.cavern_map.values():
             json_object = {
                             "cave_id": mapped_site.cave.id,
-                            "warnings": [
-                                warning.to_json()
-                                for warning in mapped_site.warnings
-                            ]
+                            "warnings": mapped_site.warnings
                           }
             json_array.append(json_object)
         return json_array
@@ -106,7 +189,8 @@ class Notebook:
     @staticmethod
     def from_json(cavern_system, json_array):
         """
-        Restores the notebook game state from a json array of mapped site json objects and the cavern system
+        Restores the notebook game state from a json array of mapped site json objects and the cavern system.  Warnings
+        saved as a list of status messages, rather than as flags, are accepted too.
         :param cavern_system: layout of cavern system
         :param json_array: jsonified array containing the mapped site named tuples that make of the cavern map
         :return: the reconstituted cavern map.
@@ -114,9 +198,41 @@ class Notebook:
         cavern_map = []
         for json_object in json_array:
             cave = cavern_system.get_cave(json_object['cave_id'])
-            status_messages = []
-            for warning in json_object['warnings']:
-                status_messages.append(StatusMessage.from_json(warning))
-            mapped_site = Mapped_Site(cave, status_messages)
+            warnings = json_object['warnings']
+            if not isinstance(warnings, int):
+                warnings = warning_flags([StatusMessage.from_json(warning) for warning in warnings])
+            mapped_site = Mapped_Site(cave, warnings)
             cavern_map.append(mapped_site)
         return cavern_map
+
+    def positions_to_json(self):
+        """
+        Minimal json object needed to preserve the layout of the cavern map between turns
+        :return: json compatible array of cave id, column and rank triples
+        """
+        return [[cave_id, *position] for cave_id, position in self.positions.items()]
+
+    @staticmethod
+    def positions_from_json(json_array):
+        """
+        Restores the layout of the cavern map from a json array of cave id, column and rank triples
+        :param json_array: jsonified array of positions
+        :return: dictionary of cave id to (column, rank) tuple
+        """
+        return {cave_id: (column, rank) for cave_id, column, rank in json_array or []}
+
+    def stamps_to_json(self):
+        """
+        Minimal json object needed to track the changes to the cavern map between turns
+        :return: json compatible array of cave id, version and flags triples
+        """
+        return [[cave_id, *stamp] for cave_id, stamp in self.stamps.items()]
+
+    @staticmethod
+    def stamps_from_json(json_array):
+        """
+        Restores the stamps of the cavern map from a json array of cave id, version and flags triples
+        :param json_array: jsonified array of stamps
+        :return: dictionary of cave id to (version, flags) tuple
+        """
+        return {cave_id: (stamp, flags) for cave_id, stamp, flags in json_array or []}
@@ -0,0 +1,36 @@
+"""
+The hazard warnings noted for a cave in the hunter's notebook, reduced to flags.  The content of a warning is fixed by
+its source, so the flags record only which sources warned.  A cave may be within range of several bottomless pits or
+bat colonies, so those warnings are counted in two bit fields.  The counts saturate at WARNING_COUNT_MASK, which is
+only reached in games having more neighboring caves or more hazards than the standard game.
+"""
+
+WUMPUS_WARNING = 0x01
+BOTTOMLESS_PIT_WARNING_SHIFT = 1
+BAT_COLONY_WARNING_SHIFT = 3
+WARNING_COUNT_MASK = 0x03
+
+
+def warning_flags(warnings):
+    """
+    Reduces warnings to flags.
+    :param warnings: list of warning status messages
+    :return: the warning flags
+    """
+    sources = [warning.source for warning in warnings]
+    return ((WUMPUS_WARNING if 'WUMPUS' in sources else 0)
+            | min(sources.count('BOTTOMLESS_PIT'), WARNING_COUNT_MASK) << BOTTOMLESS_PIT_WARNING_SHIFT
+            | min(sources.count('BAT_COLONY'), WARNING_COUNT_MASK) << BAT_COLONY_WARNING_SHIFT)
+
+
+def warning_sources(flags):
+    """
+    Lists the sources of the warnings given by the flags in the order in which the hunter checks for hazards (Wumpus,
+    bottomless pits and then bat colonies).
+    :param flags: the warning flags
+    :return: list of warning sources
+    """
+    sources = ['WUMPUS'] if flags & WUMPUS_WARNING else []
+    sources.extend(['BOTTOMLESS_PIT'] * (flags >> BOTTOMLESS_PIT_WARNING_SHIFT & WARNING_COUNT_MASK))
+    sources.extend(['BAT_COLONY'] * (flags >> BAT_COLONY_WARNING_SHIFT & WARNING_COUNT_MASK))
+    return sources
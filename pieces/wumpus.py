@@ -1,8 +1,5 @@
-import random
-
-from status_message import StatusMessage
+from status_message import WUMPUS_NEARBY, WUMPUS_AWAKENED, WUMPUS_ENCOUNTERED, WUMPUS_SLAIN
 from pieces.hazard import Hazard, Hazard_Perimeter
-import itertools
 
 
 class Wumpus(Hazard):
@@ -10,7 +7,9 @@ class Wumpus(Hazard):
     The dangerous creature that is the object of the hunt.
     """
 
-    def __init__(self, cavern_system, cave_id, asleep=True):
+    WARNING = WUMPUS_NEARBY
+
+    def __init__(self, cavern_system, cave_id, asleep=True, rng=None):
         """
         Initialize the Wumpus object.  Uses the cavern system to find the cave associated with the cave id.  The
         optional parameters are used when the Wumpus is being unmarshalled from the client-side session.
@@ -18,8 +17,9 @@ class Wumpus(Hazard):
         :param cave_id: id of the cave the Wumpus is in
         :param asleep: whether the Wumpus is asleep.  The Wumpus starts the game asleep but is awakened by a flying
         arrow and remains awake for the remainder of the game.
+        :param rng: the game's random number generator, which determines where the Wumpus moves.
         """
-        super().__init__(cavern_system, cave_id)
+        super().__init__(cavern_system, cave_id, rng)
         self.hazard_type = 'WUMPUS'
         self.asleep = asleep
         self.alive = True
@@ -29,12 +29,9 @@ class Wumpus(Hazard):
         """
         The Wumpus hazard permeter extends as far as two caves removed from the Wumpus' location.
         """
-        surrounding_caves = [self.cavern_system.get_cave(cave_id) for cave_id in self.cave.neighboring_caves]
-        surrounding_cave_ids = list(itertools.chain(*[cave.neighboring_caves for cave in surrounding_caves]))
-        surrounding_cave_ids.extend(self.cave.neighboring_caves)
         self.hazard_perimeter = Hazard_Perimeter(
-            [StatusMessage('WARNING', self.hazard_type, "You smell a wumpus (ick!)")],
-            set(surrounding_cave_ids))
+            (Wumpus.WARNING,),
+            self.cavern_system.two_hop_neighborhood_masks[self.cave.id])
 
     def awakened(self):
         """
@@ -42,16 +39,18 @@ class Wumpus(Hazard):
         :return: list containing the status message that the Wumpus is awake and moving.
         """
         self.asleep = False
-        return [StatusMessage('INFO', self.hazard_type, "Wumpus is awake and stiring!")]
+        return [WUMPUS_AWAKENED]
 
     def move(self):
         """
         If the Wumpus is awake, it will enter one it the caves adjoining the one it is in which each turn taken.
-        Otherwise the Wumpus stays put.
+        Otherwise the Wumpus stays put.  The hazard perimeter follows the Wumpus.
         """
         if not self.asleep:
-            destination = random.choice(self.cave.neighboring_caves)
+            destination = self.rng.choice(self.cave.neighboring_caves)
             self.cave = self.cavern_system.get_cave(destination)
+            self.hazard_perimeter = self.hazard_perimeter._replace(
+                cave_mask=self.cavern_system.two_hop_neighborhood_masks[destination])
 
     def check_encounter(self, hunter, hazards=None):
         """
@@ -65,9 +64,7 @@ class Wumpus(Hazard):
         if hunter.cave.id == self.cave.id:
             if self.asleep:
                 messages.extend(self.awakened())
-            messages.extend(
-                [StatusMessage('TERMINAL', self.hazard_type,
-                               "Uh oh!  You and the wumpus are occupying the same cave now.")])
+            messages.append(WUMPUS_ENCOUNTERED)
             messages.extend(hunter.killed())
         return messages
 
@@ -91,7 +88,7 @@ class Wumpus(Hazard):
         :return: list containing the status message that the Wumpus has been slain.
         """
         self.alive = False
-        return [StatusMessage('TERMINAL', self.hazard_type, "You have slain the wumpus!")]
+        return [WUMPUS_SLAIN]
 
     def __str__(self):
         return super().__str__() + f" Wumpus is {'asleep' if self.asleep else 'awake'}"
@@ -107,11 +104,12 @@ class Wumpus(Hazard):
         }
 
     @classmethod
-    def from_json(cls, cavern_system, json):
+    def from_json(cls, cavern_system, json, rng=None):
         """
         Use of json object to reconstitute the Wumpus object and its current disposition.
         :param cavern_system: configuration of the cavern system
         :param json: json object containing current Wumpus state
+        :param rng: the game's random number generator
         :return: Wumpus object in its current state
         """
-        return Wumpus(cavern_system, json.get("cave_id"), json.get("asleep"))
+        return Wumpus(cavern_system, json.get("cave_id"), json.get("asleep"), rng)
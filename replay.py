@@ -0,0 +1,266 @@
+"""
+A compact, append-only log of a game from which the game may be replayed, move for move, without flask.  A log
+consists of a header followed by one record per turn:
+
+header: magic, version, length of the game state and the game state as encoded by game_codec when the game began
+        (the state of the game's random number generator, the cavern system and the placement of the hazards and the
+        hunter)
+turn:   the move (enter or shoot), the cave id, the seed of the game's random number generator as the turn began and the
+        outcome of the turn (the hunter's cave and quiver, the Wumpus' cave, whether the hunter and the Wumpus are
+        alive and whether the Wumpus is asleep, and a checksum of the hunter's notebook)
+
+Since the random number generator is reseeded as each turn begins, the random draws of each turn (the Wumpus' moves,
+the bats' choice of cave) are reproduced exactly however the game was stored between turns.  The replayer re-executes
+the turns through Game and Hunter and verifies that each turn has the outcome recorded.  Run from the top level of the
+wumpus project to replay logs:
+
+python -m replay logs/replays/*.wlog --repeat 100
+"""
+
+import argparse
+import glob
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+import game_codec
+
+MAGIC = b"WLOG"
+VERSION = 1
+HEADER = struct.Struct(">4sBI")
+TURN = struct.Struct(">BHQHBHBI")
+
+MOVES = {'e': 0, 's': 1}
+
+HUNTER_ALIVE = 0x01
+WUMPUS_ALIVE = 0x02
+WUMPUS_ASLEEP = 0x04
+
+Outcome = namedtuple("Outcome", ["hunter_cave_id", "quiver", "wumpus_cave_id", "flags", "notebook_checksum"])
+
+Turn = namedtuple("Turn", ["move", "cave_id", "seed", "outcome"])
+
+
+class ReplayMismatch(Exception):
+    """
+    Raised when a replayed turn does not have the outcome recorded in the log.
+    """
+
+    def __init__(self, turn_number, expected, actual):
+        super().__init__(f"Turn {turn_number} replayed as {actual} rather than {expected}.")
+        self.turn_number = turn_number
+        self.expected = expected
+        self.actual = actual
+
+
+def outcome(game):
+    """
+    Summarizes the state of the game following a turn.
+    :param game: the game
+    :return: the outcome
+    """
+    cavern_map = game.hunter.notebook.cavern_map.values()
+    sites = struct.pack(f">{2 * len(cavern_map)}H",
+                        *[value for mapped_site in cavern_map for value in (mapped_site.cave.id, mapped_site.warnings)])
+    return Outcome(game.hunter.cave.id, game.hunter.quiver, game.wumpus.cave.id,
+                   (HUNTER_ALIVE if game.hunter.alive else 0) | (WUMPUS_ALIVE if game.wumpus.alive else 0)
+                   | (WUMPUS_ASLEEP if game.wumpus.asleep else 0),
+                   zlib.crc32(sites))
+
+
+def encode_header(game):
+    """
+    Encodes the header of the log of a game that is just beginning.
+    :param game: the game
+    :return: the header as bytes
+    """
+    state = game_codec.encode(game)
+    return HEADER.pack(MAGIC, VERSION, len(state)) + state
+
+
+def encode_turn(move, cave_id, seed, game):
+    """
+    Encodes the record of a turn.
+    :param move: e (enter) or s (shoot)
+    :param cave_id: the cave entered or shot into
+    :param seed: the seed of the game's random number generator as the turn began
+    :param game: the game, following the turn
+    :return: the record as bytes
+    """
+    return TURN.pack(MOVES[move], cave_id, seed, *outcome(game))
+
+
+def decode_log(data):
+    """
+    Decodes a log.
+    :param data: the log as bytes
+    :return: tuple of the game state as it began (as encoded by game_codec) and the list of turns
+    """
+    magic, version, length = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError("Not a game replay log or an unsupported version of one.")
+    state = data[HEADER.size: HEADER.size + length]
+    moves = {code: move for move, code in MOVES.items()}
+    turns = [Turn(moves[move], cave_id, seed, Outcome(*rest))
+             for move, cave_id, seed, *rest in TURN.iter_unpack(data[HEADER.size + length:])]
+    return state, turns
+
+
+def replay(data, verify=True):
+    """
+    Replays a game from its log.  The hunter does not narrate the replay.
+    :param data: the log as bytes
+    :param verify: whether to verify that each turn has the outcome recorded
+    :return: the game as it stands following the last turn
+    """
+    state, turns = decode_log(data)
+    game = game_codec.decode(state)
+    game.hunter.narrate = False
+    for turn_number, turn in enumerate(turns, 1):
+        game.rng.seed(turn.seed)
+        if turn.move == 'e':
+            game.hunter.enter(turn.cave_id, game.hazards)
+        else:
+            game.hunter.shoot(turn.cave_id, game.hazards)
+        if verify:
+            actual = outcome(game)
+            if actual != turn.outcome:
+                raise ReplayMismatch(turn_number, turn.outcome, actual)
+    return game
+
+
+class ReplayRecorder:
+    """
+    Records game replay logs, one file per game, in a directory which may be shared by worker processes.  Each
+    record is appended to the file with a single write.  So that the directory does not grow without bound, logs are
+    removed once they have gone unwritten for longer than the maximum age and the least recently written logs are
+    removed beyond the maximum number of logs.
+    """
+
+    # The directory is pruned after this many games are started by a given process.
+    PRUNE_INTERVAL = 64
+
+    def __init__(self, directory, max_files=10_000, max_age=604_800):
+        """
+        Initializes the recorder, pruning logs left over from earlier runs.
+        :param directory: the directory in which the logs are kept
+        :param max_files: the maximum number of logs kept
+        :param max_age: number of seconds a log is kept after it was last written
+        """
+        self.directory = directory
+        self.max_files = max_files
+        self.max_age = max_age
+        self.lock = threading.Lock()
+        self.starts = 0
+        os.makedirs(self.directory, exist_ok=True)
+        self.prune()
+
+    def path(self, replay_id):
+        """
+        Location of the log of a game.
+        :param replay_id: id of the game's log
+        :return: path of the log
+        """
+        return os.path.join(self.directory, f"{replay_id}.wlog")
+
+    def start(self, replay_id, game):
+        """
+        Begins the log of a game.
+        :param replay_id: id of the game's log
+        :param game: the game, as it begins
+        """
+        with open(self.path(replay_id), "wb") as log:
+            log.write(encode_header(game))
+        with self.lock:
+            self.starts += 1
+            prune = self.starts % ReplayRecorder.PRUNE_INTERVAL == 0
+        if prune:
+            self.prune()
+
+    def prune(self):
+        """
+        Removes the logs not written within the maximum age and then the least recently written logs until no more
+        than the maximum number remain.
+        """
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith(".wlog"):
+                try:
+                    entries.append((entry.stat().st_mtime, entry.path))
+                except OSError:
+                    continue
+        entries.sort()
+        expired = time.time() - self.max_age
+        kept = [modified for modified, _ in entries if modified >= expired]
+        for modified, path in entries[:len(entries) - min(len(kept), self.max_files)]:
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    @staticmethod
+    def begin_turn(game):
+        """
+        Reseeds the game's random number generator as a turn begins, so that the turn's random draws may be
+        reproduced.
+        :param game: the game
+        :return: the seed
+        """
+        return game.rng_state()
+
+    def record(self, replay_id, move, cave_id, seed, game):
+        """
+        Appends a turn to the log of a game.
+        :param replay_id: id of the game's log
+        :param move: e (enter) or s (shoot)
+        :param cave_id: the cave entered or shot into
+        :param seed: the seed provided by begin_turn
+        :param game: the game, following the turn
+        """
+        # A log that was pruned is not begun anew, since it would lack the game as it began.
+        try:
+            log = os.open(self.path(replay_id), os.O_WRONLY | os.O_APPEND)
+        except FileNotFoundError:
+            return
+        try:
+            os.write(log, encode_turn(move, cave_id, seed, game))
+        finally:
+            os.close(log)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replays game replay logs and verifies their outcomes.")
+    parser.add_argument("logs", nargs="+", help="log files or glob patterns")
+    parser.add_argument("--repeat", type=int, default=1, help="number of times each log is replayed")
+    args = parser.parse_args()
+
+    paths = [path for pattern in args.logs for path in sorted(glob.glob(pattern)) or [pattern]]
+    logs = []
+    for path in paths:
+        with open(path, "rb") as log:
+            logs.append((path, log.read()))
+
+    failures = 0
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        for path, data in logs:
+            try:
+                replay(data)
+            except ReplayMismatch as mismatch:
+                failures += 1
+                print(f"{path}: {mismatch}")
+    elapsed = time.perf_counter() - started
+    replays = args.repeat * len(logs)
+    turns = args.repeat * sum(len(decode_log(data)[1]) for _, data in logs)
+    print(f"{replays} replays ({turns} turns) in {elapsed:.2f}s: {replays / elapsed:.0f} replays/s, "
+          f"{failures} mismatched")
+    if failures:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,186 @@
+"""
+Headless simulation of complete games, for balance tuning and load modelling.  Games are played by a hunter policy
+through the same Game, Hunter and hazard objects the web application uses, but without flask, without rendering the
+cavern map and without narrating the hunter's progress.  Batches of games may be spread over a pool of processes.
+Run from the top level of the wumpus project:
+
+python -m simulation --games 100000 --workers 8 --policy cautious
+"""
+
+import argparse
+import random
+import time
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+
+from game import Game, Game_Size
+from pieces.hunter import Hunter
+
+Situation = namedtuple("Situation", ["cave_id", "neighboring_caves", "quiver", "warnings", "notebook"])
+
+Outcome = namedtuple("Outcome", ["result", "turns", "arrows_used"])
+
+SimulationReport = namedtuple("SimulationReport", ["games", "results", "turns", "elapsed", "games_per_second"])
+
+WON = "WON"
+EATEN = "EATEN"
+FELL = "FELL"
+TIMED_OUT = "TIMED_OUT"
+RESULTS = (WON, EATEN, FELL, TIMED_OUT)
+
+# Games not decided within this many turns are abandoned.
+MAX_TURNS = 200
+
+# Batches are split into chunks of this many games, each chunk played by a single worker.
+CHUNK_SIZE = 250
+
+
+def random_policy(situation, rng):
+    """
+    Wanders about at random, now and then shooting an arrow into a randomly chosen adjoining cave.
+    :param situation: what the hunter knows of the game
+    :param rng: the policy's random number generator
+    :return: tuple of the move ('e' to enter or 's' to shoot) and the cave id
+    """
+    if situation.quiver and rng.random() < 0.1:
+        return 's', rng.choice(situation.neighboring_caves)
+    return 'e', rng.choice(situation.neighboring_caves)
+
+
+def cautious_policy(situation, rng):
+    """
+    Shoots into a randomly chosen adjoining cave upon smelling the Wumpus and otherwise explores, preferring caves not
+    yet visited and avoiding a return to the caves from which a draft or bats were detected.
+    :param situation: what the hunter knows of the game
+    :param rng: the policy's random number generator
+    :return: tuple of the move ('e' to enter or 's' to shoot) and the cave id
+    """
+    if situation.quiver and 'WUMPUS' in situation.warnings:
+        return 's', rng.choice(situation.neighboring_caves)
+    visited = {mapped_site.cave.id: mapped_site.warnings for mapped_site in situation.notebook.cavern_map.values()}
+    unvisited = [cave_id for cave_id in situation.neighboring_caves if cave_id not in visited]
+    if unvisited and not situation.warnings:
+        return 'e', rng.choice(unvisited)
+    safe = [cave_id for cave_id in situation.neighboring_caves
+            if cave_id in visited and not visited[cave_id]]
+    return 'e', rng.choice(safe or situation.neighboring_caves)
+
+
+POLICIES = {"random": random_policy, "cautious": cautious_policy}
+
+
+def play_game(policy, seed, max_turns=MAX_TURNS, size=None):
+    """
+    Plays a complete game.
+    :param policy: callable choosing the hunter's move given the hunter's situation and a random number generator
+    :param seed: seed from which both the game's and the policy's random number generators are seeded
+    :param max_turns: number of turns after which the game is abandoned
+    :param size: the size of the game (the standard game if not provided)
+    :return: the outcome of the game
+    """
+    rng = random.Random(seed)
+    game = Game(rng=random.Random(rng.getrandbits(64)), size=size)
+    hunter = game.hunter
+    hunter.narrate = False
+    warnings = hunter.start_up(game.hazards)
+
+    for turn in range(1, max_turns + 1):
+        situation = Situation(hunter.cave.id, hunter.cave.neighboring_caves, hunter.quiver,
+                              [warning.source for warning in warnings], hunter.notebook)
+        move, cave_id = policy(situation, rng)
+        if move == 's':
+            hunter.shoot(cave_id, game.hazards)
+        else:
+            hunter.enter(cave_id, game.hazards)
+        if not game.wumpus.alive:
+            return Outcome(WON, turn, Hunter.ARROW_COUNT - hunter.quiver)
+        if not hunter.alive:
+            result = EATEN if hunter.cave.id == game.wumpus.cave.id else FELL
+            return Outcome(result, turn, Hunter.ARROW_COUNT - hunter.quiver)
+        warnings = hunter.check_for_hazards(game.hazards)
+    return Outcome(TIMED_OUT, max_turns, Hunter.ARROW_COUNT - hunter.quiver)
+
+
+def play_games(policy, seed, games, max_turns=MAX_TURNS, size=None):
+    """
+    Plays a series of games, each seeded from the given seed.  Runs in a worker process when games are spread over a
+    process pool.
+    :param policy: callable choosing the hunter's move
+    :param seed: seed from which each game's seed is drawn
+    :param games: number of games to play
+    :param max_turns: number of turns after which a game is abandoned
+    :param size: the size of the games (the standard game if not provided)
+    :return: tuple of the count of each result and the total number of turns played
+    """
+    rng = random.Random(seed)
+    results = dict.fromkeys(RESULTS, 0)
+    turns = 0
+    for _ in range(games):
+        outcome = play_game(policy, rng.getrandbits(64), max_turns, size)
+        results[outcome.result] += 1
+        turns += outcome.turns
+    return results, turns
+
+
+def run_batch(games, policy=random_policy, seed=None, workers=1, max_turns=MAX_TURNS, size=None):
+    """
+    Plays a batch of games, spread over a pool of processes if more than one worker is requested.  The batch is split
+    into chunks, each with its own seed drawn from the batch seed, so that the results depend only upon the batch
+    seed and not upon the number of workers or the order in which they finish.
+    :param games: number of games to play
+    :param policy: callable choosing the hunter's move.  It must be defined at module level when using several workers.
+    :param seed: seed for the batch.  If not provided, a seed is drawn from the operating system.
+    :param workers: number of worker processes
+    :param max_turns: number of turns after which a game is abandoned
+    :param size: the size of the games (the standard game if not provided)
+    :return: report of the results of the batch along with the rate at which games were played
+    """
+    rng = random.Random(seed if seed is not None else random.SystemRandom().getrandbits(64))
+    chunk_count = max(-(-games // CHUNK_SIZE), 1)
+    chunks = [games // chunk_count + (1 if index < games % chunk_count else 0) for index in range(chunk_count)]
+    chunk_seeds = [rng.getrandbits(64) for _ in chunks]
+
+    started = time.perf_counter()
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            chunk_results = list(executor.map(play_games, [policy] * chunk_count, chunk_seeds, chunks,
+                                              [max_turns] * chunk_count, [size] * chunk_count))
+    else:
+        chunk_results = [play_games(policy, chunk_seed, chunk, max_turns, size)
+                         for chunk_seed, chunk in zip(chunk_seeds, chunks)]
+    elapsed = time.perf_counter() - started
+
+    results = dict.fromkeys(RESULTS, 0)
+    turns = 0
+    for chunk_result, chunk_turns in chunk_results:
+        for result, count in chunk_result.items():
+            results[result] += count
+        turns += chunk_turns
+    return SimulationReport(games, results, turns, elapsed, games / elapsed if elapsed else 0.0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plays batches of games without the web application.")
+    parser.add_argument("--games", type=int, default=10_000, help="number of games to play")
+    parser.add_argument("--workers", type=int, default=1, help="number of worker processes")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the batch")
+    parser.add_argument("--policy", choices=sorted(POLICIES), default="random", help="the hunter's policy")
+    parser.add_argument("--max-turns", type=int, default=MAX_TURNS, help="turns after which a game is abandoned")
+    parser.add_argument("--caves", type=int, default=Game.STANDARD_SIZE.cave_count, help="number of caves")
+    parser.add_argument("--neighboring-caves", type=int, default=Game.STANDARD_SIZE.neighboring_cave_count,
+                        help="number of caves adjoining each cave")
+    parser.add_argument("--pits", type=int, default=Game.STANDARD_SIZE.bottomless_pit_count,
+                        help="number of bottomless pits")
+    parser.add_argument("--bats", type=int, default=Game.STANDARD_SIZE.bat_colony_count, help="number of bat colonies")
+    args = parser.parse_args()
+
+    size = Game_Size(args.caves, args.neighboring_caves, args.pits, args.bats)
+    report = run_batch(args.games, POLICIES[args.policy], args.seed, args.workers, args.max_turns, size)
+    print(f"{report.games} games ({report.turns} turns) in {report.elapsed:.2f}s: "
+          f"{report.games_per_second:.0f} games/s, {report.turns / report.elapsed:.0f} turns/s")
+    for result, count in report.results.items():
+        print(f"{result:>10}: {count:>9} ({count / report.games:.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,57 +1,36 @@
 /**
- * Calls the promise identifying whether the hunter is ready to proceed with the turn.  Depending upon the outcome of
- * that promise, the hunter either continues to take or abandon his/her turn.  Because both involve asynchronous calls
- * to the server, a promise is required.
- * @param check_quiver_url - url of the ajax call to check the quiver contents
- * @param take_turn_url - url of the ajax call to carry out the hunter's turn request.
- * @param move - whether the hunter wants to enter or shoot into a cave on this upcoming turn.
+ * The number of arrows remaining in the hunter's quiver.  It is set when the game board is served and kept up to date
+ * from the response to each turn, so no separate call to the server is needed to check the quiver.
  */
-process_turn = function(check_quiver_url, take_turn_url, move) {
-    check_quiver(check_quiver_url, move)
-        .then(function(data) {
-            console.log("arrows: " + data);
-            take_turn(take_turn_url, move);
-        })
-        .catch(function(data) {
-            console.log("arrows: " + arrows)
-        })
-};
+var arrows = 0;
+
+/**
+ * The version of the cavern map displayed.  It is reported to the server with each turn so that only the changes to
+ * the map need be returned.
+ */
+var map_version = 0;
 
 /**
- * Wraps in a promise object, an ajax call to determine the number of arrows the hunter has remaining in the quiver.
- * If the quiver contains just 1 arrow, the hunter is cautioned against using it unwisely.  The hunter may decide
- * to shoot it anyway.  The hunter's actual turn is deferred until the hunter decides whether to shoot his/her last
- * arrow.  If the hunter refrains, the turn is aborted.
- * @param check_quiver_url - url of the ajax call to check the quiver contents
+ * The status messages whose content never varies, by code.  It is set when the game board is served, so that the
+ * responses to turns need carry only the codes of such messages.
+ */
+var message_catalog = {};
+
+/**
+ * Determines whether the hunter is ready to proceed with the turn and, if so, takes it.  If the quiver contains just
+ * 1 arrow, the hunter is cautioned against using it unwisely.  The hunter may decide to shoot it anyway.  If the hunter
+ * refrains, the turn is aborted.
+ * @param take_turn_url - url of the ajax call to carry out the hunter's turn request.
  * @param move - whether the hunter wants to enter or shoot into a cave on this upcoming turn.
- * @returns {Promise<any>}
  */
-var check_quiver = function(check_quiver_url, move) {
-
-    return new Promise(function(resolve, reject) {
-        $.ajax({
-            url: check_quiver_url,
-            type: 'GET',
-            success: function (response) {
-                let arrows = response['arrows'];
-                if (arrows === 1 && move === 'shoot') {
-                    let answer = confirm("This is your last arrow.  Are you sure you want to shoot it?");
-                    if (!answer) {
-                        reject("save last one");
-                    }
-                    else {
-                        resolve("shoot last one");
-                    }
-                }
-                else {
-                    resolve("no issue");
-                }
-            },
-            error: function(request) {
-                reject("error");
-            }
-        });
-    });
+process_turn = function(take_turn_url, move) {
+    if (arrows === 1 && move === 'shoot') {
+        if (!confirm("This is your last arrow.  Are you sure you want to shoot it?")) {
+            console.log("arrows: " + arrows);
+            return;
+        }
+    }
+    take_turn(take_turn_url, move);
 };
 
 /**
@@ -75,7 +54,7 @@ var take_turn = function(take_turn_url, move) {
 
     $.ajax({
         url: take_turn_url,
-        data: JSON.stringify({"move": move, "cave_id": cave_id}),
+        data: JSON.stringify({"move": move, "cave_id": cave_id, "map_version": map_version}),
         dataType: "json",
         contentType: "application/json",
         type: 'POST',
@@ -83,9 +62,11 @@ var take_turn = function(take_turn_url, move) {
             //console.log(response);
             let messages = response['messages'];
             let cave_ids = response['cave_ids'];
-            let arrows = response['arrows'];
             let game_over = response['game_over'];
             let notes = response['notes'];
+            let map_patch = response['map_patch'];
+            let map_data = response['map_data'];
+            arrows = response['arrows'];
 
             // Update the cave options to take into account the hunter's (possibly new) surroundings.
             let optionList = "<option value=''>Choose...</option>";
@@ -97,6 +78,9 @@ var take_turn = function(take_turn_url, move) {
             // Populate the status board with the status messages returned by the call and color them appropriately.
             let messageList = "";
             messages.forEach(function(message) {
+                if('code' in message) {
+                    message = message_catalog[message.code];
+                }
                 let color_class = 'text-default';
                 if(message.type === 'WARNING') {
                     color_class = 'text-warning'
@@ -120,10 +104,17 @@ var take_turn = function(take_turn_url, move) {
                 shootButton.hide()
             }
 
-            // Upldate the field notes with the latest cavern map.
+            // Upldate the field notes with the latest cavern map or, if only the changes were sent, patch the map.
             if(notes) {
                 notebook.html(notes);
             }
+            else if(map_patch) {
+                apply_map_patch(notebook, map_patch);
+            }
+            else if(map_data) {
+                draw_map(notebook, map_data);
+            }
+            map_version = response['map_version'];
         },
         error: function (request) {
             let errors = $.parseJSON(request.responseText).errors;
@@ -137,4 +128,127 @@ var take_turn = function(take_turn_url, move) {
             errorMessages.html(errorList);
         }
     });
-};
\ No newline at end of file
+};
+
+/**
+ * Patches the cavern map displayed with the changes since the version held.  The dimensions of the map and the
+ * translation of the graph are updated and each svg fragment either replaces the element with the same id or, if
+ * new, is added to the graph.
+ * @param notebook - the element containing the svg cavern map.
+ * @param map_patch - the frame attributes and svg fragments returned by the server.
+ */
+var apply_map_patch = function(notebook, map_patch) {
+    let svg = notebook.find("svg")[0];
+    let graph = svg.querySelector("#graph0");
+    svg.setAttribute("width", map_patch['width']);
+    svg.setAttribute("height", map_patch['height']);
+    svg.setAttribute("viewBox", map_patch['viewBox']);
+    graph.setAttribute("transform", map_patch['transform']);
+    graph.querySelector("polygon").setAttribute("points", map_patch['background']);
+
+    let parser = new DOMParser();
+    map_patch['elements'].forEach(function(fragment) {
+        let wrapper = parser.parseFromString(
+            "<svg xmlns='http://www.w3.org/2000/svg' xmlns:xlink='http://www.w3.org/1999/xlink'>" + fragment + "</svg>",
+            "image/svg+xml");
+        let element = document.importNode(wrapper.documentElement.firstElementChild, true);
+        let existing = graph.querySelector("#" + element.id);
+        if(existing) {
+            graph.replaceChild(element, existing);
+        }
+        else {
+            graph.appendChild(element);
+        }
+    });
+};
+
+/**
+ * The positions at which the caves were drawn when the browser draws the cavern map itself.  Caves keep their
+ * positions from turn to turn so that the map does not jump about.
+ */
+var map_positions = {};
+
+/**
+ * Lays out and draws the cavern map from the notebook contents provided by the server.  Caves drawn on earlier turns
+ * stay put while newly discovered caves, starting out near the caves they adjoin, are settled by a force simulation.
+ * Visited caves are outlined in green, or in yellow if a hazard was detected from there, and caves discovered but not
+ * yet entered in black.  The hunter's current location is starred.
+ * @param notebook - the element to contain the svg cavern map.
+ * @param map_data - the caves and tunnels returned by the server.
+ */
+var draw_map = function(notebook, map_data) {
+    const rx = 27, ry = 18, margin = 4, spacing = 72;
+
+    // Seed the new caves next to the caves they adjoin or, if they adjoin none drawn (as when the hunter is dropped
+    // by bats into an unexplored part of the cavern system), to the right of the map.
+    let right = d3.max(Object.values(map_positions), function(position) { return position.x; }) || 0;
+    let nodes = map_data['caves'].map(function(cave) {
+        let node = Object.assign({}, cave);
+        let position = map_positions[cave.id];
+        if(position) {
+            node.fx = position.x;
+            node.fy = position.y;
+        }
+        else {
+            let neighbors = map_data['tunnels']
+                .filter(function(tunnel) { return tunnel.indexOf(cave.id) >= 0; })
+                .map(function(tunnel) { return map_positions[tunnel[0] === cave.id ? tunnel[1] : tunnel[0]]; })
+                .filter(function(neighbor) { return neighbor; });
+            node.x = (neighbors.length ? d3.mean(neighbors, function(neighbor) { return neighbor.x; }) : right + spacing)
+                + (Math.random() - 0.5) * rx;
+            node.y = (neighbors.length ? d3.mean(neighbors, function(neighbor) { return neighbor.y; }) + spacing : 0)
+                + (Math.random() - 0.5) * ry;
+        }
+        return node;
+    });
+    let links = map_data['tunnels'].map(function(tunnel) { return {"source": tunnel[0], "target": tunnel[1]}; });
+
+    let simulation = d3.forceSimulation(nodes)
+        .force("link", d3.forceLink(links).id(function(node) { return node.id; }).distance(spacing))
+        .force("charge", d3.forceManyBody().strength(-150))
+        .force("collide", d3.forceCollide(rx + margin))
+        .stop();
+    for(let tick = 0; tick < 200; tick++) {
+        simulation.tick();
+    }
+    nodes.forEach(function(node) {
+        map_positions[node.id] = {"x": node.x, "y": node.y};
+    });
+
+    let left = d3.min(nodes, function(node) { return node.x; }) - rx - margin;
+    let top = d3.min(nodes, function(node) { return node.y; }) - ry - margin;
+    let width = d3.max(nodes, function(node) { return node.x; }) + rx + margin - left;
+    let height = d3.max(nodes, function(node) { return node.y; }) + ry + margin - top;
+
+    notebook.empty();
+    let svg = d3.select(notebook[0]).append("svg")
+        .attr("width", width + "pt")
+        .attr("height", height + "pt")
+        .attr("viewBox", [left, top, width, height].join(" "));
+
+    svg.selectAll("line").data(links).enter().append("line")
+        .attr("stroke", "black")
+        .attr("x1", function(link) { return link.source.x; })
+        .attr("y1", function(link) { return link.source.y; })
+        .attr("x2", function(link) { return link.target.x; })
+        .attr("y2", function(link) { return link.target.y; });
+
+    let caves = svg.selectAll("g").data(nodes).enter().append("g")
+        .attr("id", function(node) { return "node" + node.id; })
+        .attr("transform", function(node) { return "translate(" + node.x + " " + node.y + ")"; });
+    caves.append("title")
+        .text(function(node) { return node.warnings.join(","); });
+    caves.append("ellipse")
+        .attr("rx", rx)
+        .attr("ry", ry)
+        .attr("fill", "white")
+        .attr("stroke", function(node) {
+            return node.visited ? (node.warnings.length ? "yellow" : "green") : "black";
+        });
+    caves.append("text")
+        .attr("text-anchor", "middle")
+        .attr("y", 3.7)
+        .attr("font-family", "Times,serif")
+        .attr("font-size", 14)
+        .text(function(node) { return node.id + (node.current ? " *" : ""); });
+};
@@ -3,19 +3,40 @@ class StatusMessage:
     Mechanism for holding the details of the game state.  Note that even construction of a single status message
     is incorporated into a list so that I could use 'extend' always rather than have to determine when 'append' was
     more applicable.  I did this because the list of status messages grows, method by method.
+
+    Status messages are immutable.  The messages whose content never varies are interned in a catalog under a small
+    code, so a single instance of each serves every game, and only those messages mentioning cave ids or arrow counts
+    are built as the game proceeds.  An interned message travels as its code alone.
     """
 
-    def __init__(self, message_type, source, content):
+    __slots__ = ("type", "source", "content", "code")
+
+    # Interned status messages, by code.
+    catalog = {}
+
+    def __init__(self, message_type, source, content, code=None):
         """
         Message describing some aspect of the game state.  The type and souce of the message were used for filtering
         and highlighting.
         :param message_type: INFO, WARNING, TERMINAL
         :param source: WUMPUS, BOTTOMLESS_PIT, BAT_COLONY, GENERAL
         :param content: message content.
+        :param code: the code under which the message is interned, if it is.
         """
-        self.type = message_type
-        self.source = source
-        self.content = content
+        object.__setattr__(self, "type", message_type)
+        object.__setattr__(self, "source", source)
+        object.__setattr__(self, "content", content)
+        object.__setattr__(self, "code", code)
+
+    def __setattr__(self, name, value):
+        raise AttributeError("Status messages are immutable.")
+
+    def __eq__(self, other):
+        return isinstance(other, StatusMessage) \
+            and (self.type, self.source, self.content) == (other.type, other.source, other.content)
+
+    def __hash__(self):
+        return hash((self.type, self.source, self.content))
 
     def __str__(self):
         return f"Status message: type: {self.type}, source: {self.source}, content: {self.content}"
@@ -23,12 +44,39 @@ class StatusMessage:
     def __repr__(self):
         return f"Status message: type: {self.type}, source: {self.source}, content: {self.content}"
 
+    @staticmethod
+    def intern(code, message_type, source, content):
+        """
+        Adds a message whose content never varies to the catalog.
+        :param code: small integer identifying the message
+        :param message_type: INFO, WARNING, TERMINAL
+        :param source: WUMPUS, BOTTOMLESS_PIT, BAT_COLONY, GENERAL
+        :param content: message content.
+        :return: the interned message
+        """
+        if code in StatusMessage.catalog:
+            raise ValueError(f"Status message code {code} is already in use.")
+        message = StatusMessage(message_type, source, content, code)
+        StatusMessage.catalog[code] = message
+        return message
+
+    @staticmethod
+    def catalog_to_json():
+        """
+        Converts the catalog into a json compatible dictionary with which interned messages may be looked up by code.
+        :return: json compatible dictionary of code to message
+        """
+        return {code: {"type": message.type, "source": message.source, "content": message.content}
+                for code, message in StatusMessage.catalog.items()}
+
     def to_json(self):
         """
         Converts the object into a json compatible dictionary that can be delivered via ajax and can be used to
-        help reconstitute the game state.
+        help reconstitute the game state.  An interned message is reduced to its code.
         :return: json compatible dictionary
         """
+        if self.code is not None:
+            return {"code": self.code}
         return {
             "type": self.type,
             "source": self.source,
@@ -40,6 +88,27 @@ class StatusMessage:
         """
         Restores the status message game state from a json object
         :param json: the json object holding the status message state
-        :return: the reconstituted status message
+        :return: the reconstituted status message (the interned instance for a code)
         """
+        if 'code' in json:
+            return StatusMessage.catalog[json['code']]
         return StatusMessage(json['type'], json['source'], json['content'])
+
+
+# The messages whose content never varies.  Codes must never be reused for a different message.
+WUMPUS_NEARBY = StatusMessage.intern(1, 'WARNING', 'WUMPUS', "You smell a wumpus (ick!)")
+BOTTOMLESS_PIT_NEARBY = StatusMessage.intern(2, 'WARNING', 'BOTTOMLESS_PIT', "You feel a draft")
+BAT_COLONY_NEARBY = StatusMessage.intern(3, 'WARNING', 'BAT_COLONY', "You hear the flapping of wings")
+WUMPUS_AWAKENED = StatusMessage.intern(4, 'INFO', 'WUMPUS', "Wumpus is awake and stiring!")
+WUMPUS_ENCOUNTERED = StatusMessage.intern(5, 'TERMINAL', 'WUMPUS',
+                                          "Uh oh!  You and the wumpus are occupying the same cave now.")
+WUMPUS_SLAIN = StatusMessage.intern(6, 'TERMINAL', 'WUMPUS', "You have slain the wumpus!")
+BOTTOMLESS_PIT_ENCOUNTERED = StatusMessage.intern(7, 'TERMINAL', 'BOTTOMLESS_PIT', "You fell into a bottomless pit!")
+BAT_COLONY_ENCOUNTERED = StatusMessage.intern(8, 'INFO', 'BAT_COLONY',
+                                              "You've stumbled into a bat colony.  "
+                                              "Some of the bats are carrying you into another cave!")
+HUNTER_KILLED = StatusMessage.intern(9, 'TERMINAL', 'GENERAL', "You've been killed.  Sorry.")
+NO_ARROWS_LEFT = StatusMessage.intern(10, 'WARNING', 'GENERAL',
+                                      "You have no arrows left.  All you can do is avoid the wumpus.")
+MALFORMED_TURN = StatusMessage.intern(11, 'WARNING', 'GENERAL',
+                                      "Each turn must give the move (enter or shoot) and the cave id.")
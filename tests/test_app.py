@@ -0,0 +1,57 @@
+import json
+
+import pytest
+
+import game_codec
+from app import app, game_store
+from status_message import MALFORMED_TURN
+
+
+@pytest.fixture
+def client():
+    client = app.test_client()
+    assert client.get("/").status_code == 200
+    return client
+
+
+@pytest.mark.parametrize("turns", [[1], ["enter"], [{"cave_id": 3}], [{"move": 1, "cave_id": 3}],
+                                   [{"move": "enter", "cave_id": "three"}], [{"move": "enter", "cave_id": [3]}]])
+def test_malformed_batch_is_turned_away(client, turns):
+    response = client.post("/take_turns", data=json.dumps({"turns": turns}))
+    assert response.status_code == 400
+    assert response.get_json() == {"errors": [MALFORMED_TURN.content], "messages": [MALFORMED_TURN.to_json()]}
+
+
+@pytest.mark.parametrize("body", ["[1]", "not json", '{"turns": 1}'])
+def test_malformed_request_is_turned_away(client, body):
+    assert client.post("/take_turn", data=body).status_code == 400
+    assert client.post("/take_turns", data=body).status_code == 400
+
+
+@pytest.mark.parametrize("map_version", ["abc", [1], 1.5, True])
+def test_malformed_map_version_is_turned_away_before_the_turn(client, map_version):
+    page = client.get("/").get_data(as_text=True)
+    cave_id = int(page[page.index('id="cave_id"'):].split("<option value=")[2].split('"')[1])
+    response = client.post("/take_turn", data=json.dumps({"move": "enter", "cave_id": cave_id,
+                                                          "map_version": map_version}))
+    assert response.status_code == 400
+    response = client.post("/take_turns", data=json.dumps({"turns": [{"move": "enter", "cave_id": cave_id}],
+                                                           "map_version": map_version}))
+    assert response.status_code == 400
+    assert client.get("/check_quiver").status_code == 200
+
+
+def test_finished_game_is_turned_away(client):
+    page = client.get("/").get_data(as_text=True)
+    cave_id = int(page[page.index('id="cave_id"'):].split("<option value=")[2].split('"')[1])
+    with client.session_transaction() as session:
+        game = game_store.get(session["game_id"]) if game_store else game_codec.decode(session["game"])
+        game.hunter.alive = False
+        if game_store:
+            game_store.put(session["game_id"], game)
+        else:
+            session["game"] = game_codec.encode(game)
+    turn = {"move": "enter", "cave_id": cave_id}
+    assert client.post("/take_turn", data=json.dumps(turn)).status_code == 400
+    assert client.post("/take_turns", data=json.dumps({"turns": [turn]})).status_code == 400
+    assert client.get("/check_quiver").status_code == 200
@@ -0,0 +1,37 @@
+import random
+
+import pytest
+
+from pieces.cavern_system import CavernSystem
+
+
+@pytest.mark.parametrize("cave_count, neighboring_cave_count", [(20, 3), (4, 3), (30, 3), (50, 4), (101, 4),
+                                                                (300, 3), (1000, 5), (2000, 3)])
+def test_cavern_system_is_well_formed(cave_count, neighboring_cave_count):
+    for seed in range(5):
+        cavern_system = CavernSystem(rng=random.Random(seed), cave_count=cave_count,
+                                     neighboring_cave_count=neighboring_cave_count)
+        caves = cavern_system.caves
+        assert sorted(cave.id for cave in cavern_system.cavern_system) == list(range(1, cave_count + 1))
+        for cave in caves[1:]:
+            assert len(cave.neighboring_caves) == neighboring_cave_count
+            assert len(set(cave.neighboring_caves)) == neighboring_cave_count
+            assert cave.id not in cave.neighboring_caves
+            assert all(cave.id in caves[neighboring_cave].neighboring_caves
+                       for neighboring_cave in cave.neighboring_caves)
+
+        # Every cave can be reached from every other cave.
+        reached, frontier = {1}, [1]
+        while frontier:
+            cave_id = frontier.pop()
+            for neighboring_cave in caves[cave_id].neighboring_caves:
+                if neighboring_cave not in reached:
+                    reached.add(neighboring_cave)
+                    frontier.append(neighboring_cave)
+        assert len(reached) == cave_count
+
+
+@pytest.mark.parametrize("cave_count, neighboring_cave_count", [(21, 3), (3, 3), (10, 1)])
+def test_impossible_cavern_system_is_rejected(cave_count, neighboring_cave_count):
+    with pytest.raises(ValueError):
+        CavernSystem(rng=random.Random(1), cave_count=cave_count, neighboring_cave_count=neighboring_cave_count)
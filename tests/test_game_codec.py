@@ -0,0 +1,56 @@
+import random
+
+import pytest
+
+import game_codec
+from game import Game, Game_Size
+
+
+def play(game, turns, rng):
+    """
+    Wanders the hunter about the cavern system, mapping the caves entered, until the turns run out or the game is over.
+    """
+    for _ in range(turns):
+        if not (game.hunter.alive and game.wumpus.alive):
+            break
+        game.hunter.enter(rng.choice(game.hunter.cave.neighboring_caves), game.hazards)
+        game.hunter.notebook.prepare(game.hunter.cave.id)
+
+
+def snapshot(game):
+    """
+    Captures the whole of the game's state, including the next draw of its random number generator.
+    """
+    notebook = game.hunter.notebook
+    return {"caves": [(cave.id, list(cave.neighboring_caves)) for cave in game.cavern_system.caves[1:]],
+            "wumpus": (game.wumpus.cave.id, game.wumpus.asleep, game.wumpus.alive),
+            "bottomless_pits": [bottomless_pit.cave.id for bottomless_pit in game.bottomless_pits],
+            "bats": [bat_colony.cave.id for bat_colony in game.bats],
+            "hunter": (game.hunter.cave.id, game.hunter.quiver, game.hunter.alive),
+            "cavern_map": [(mapped_site.cave.id, mapped_site.warnings) for mapped_site in notebook.cavern_map.values()],
+            "positions": notebook.positions,
+            "stamps": notebook.stamps,
+            "version": notebook.version,
+            "draw": game.rng.getrandbits(64)}
+
+
+@pytest.mark.parametrize("size, version", [(Game.STANDARD_SIZE, game_codec.VERSION),
+                                           (Game_Size(300, 3, 6, 6), game_codec.WIDE_VERSION),
+                                           (Game_Size(2000, 4, 4, 4), game_codec.WIDE_VERSION)])
+def test_game_survives_encoding(size, version):
+    for seed in range(5):
+        game = Game(rng=random.Random(seed), size=size)
+        play(game, 30, random.Random(seed))
+        data = game_codec.encode(game)
+        assert data[0] == version
+        assert snapshot(game_codec.decode(data)) == snapshot(game)
+
+
+@pytest.mark.parametrize("wumpus_alive, hunter_alive", [(False, True), (True, False), (False, False)])
+def test_finished_game_stays_finished(wumpus_alive, hunter_alive):
+    game = Game(rng=random.Random(1))
+    game.wumpus.asleep = False
+    game.wumpus.alive = wumpus_alive
+    game.hunter.alive = hunter_alive
+    data = game_codec.encode(game)
+    assert snapshot(game_codec.decode(data)) == snapshot(game)
@@ -0,0 +1,50 @@
+import threading
+import time
+
+import metrics
+from game_pool import GamePool
+
+
+def test_depleted_pool_shows_in_metrics():
+    # The background thread never manages to add a game, so once the prefilled games are gone every game is made on
+    # demand.
+    release = threading.Event()
+
+    def factory():
+        if threading.current_thread().name == "game-pool":
+            release.wait()
+        return "game", [], "map"
+
+    pool = GamePool(factory, size=4, refill_threshold=2)
+    collector = metrics.Collector(pool.stats, GamePool.METRICS)
+    try:
+        for _ in range(4 + 3):
+            assert pool.take() == ("game", [], "map")
+        exposition = metrics.exposition()
+    finally:
+        metrics.registry.remove(collector)
+        release.set()
+
+    assert "wumpus_game_pool_misses_total 3" in exposition
+    assert "wumpus_game_pool_depletions_total 1" in exposition
+    assert "wumpus_game_pool_hits_total 4" in exposition
+
+
+def test_full_pool_does_not_refill(caplog):
+    # A threshold at or above the size must not leave the background thread topping up a pool that is already full.
+    pool = GamePool(lambda: ("game", [], "map"), size=4, refill_threshold=4)
+    pool.start()
+    assert len(pool.entries) == 4
+    assert pool.take() == ("game", [], "map")
+    time.sleep(0.2)
+    stats = pool.stats()
+    assert stats["refills"] == 1
+    assert stats["hits"] == 1 and stats["misses"] == 0
+    assert "run dry" not in caplog.text
+
+
+def test_app_exposes_game_pool_metrics():
+    from app import app
+    client = app.test_client()
+    assert client.get("/").status_code == 200
+    assert "wumpus_game_pool_hits_total" in client.get("/metrics").get_data(as_text=True)
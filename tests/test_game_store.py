@@ -0,0 +1,27 @@
+import random
+
+import pytest
+
+from game import Game
+from game_store import MemoryGameStore, get_game_store
+
+
+def test_memory_store_provides_each_request_its_own_game():
+    store = MemoryGameStore()
+    game = Game(rng=random.Random(1))
+    store.put("game", game)
+    first, second = store.get("game"), store.get("game")
+    assert first is not second
+    assert first.hunter.cave.id == second.hunter.cave.id == game.hunter.cave.id
+
+
+def test_memory_store_forgets_expired_games():
+    store = MemoryGameStore(ttl=-1)
+    store.put("game", Game(rng=random.Random(1)))
+    assert store.get("game") is None
+
+
+def test_unknown_game_store_is_rejected():
+    assert get_game_store("cookie") is None
+    with pytest.raises(ValueError):
+        get_game_store("memroy")
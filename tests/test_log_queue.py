@@ -0,0 +1,58 @@
+import logging
+import os
+import queue
+import time
+
+import pytest
+
+from log_queue import DROP_NEWEST, DROP_OLDEST, BoundedQueueHandler, start_queue_logging
+
+
+def written(path, text, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if os.path.exists(path) and text in open(path).read():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+@pytest.mark.skipif(not hasattr(os, "fork"), reason="requires fork")
+def test_forked_process_writes_its_records(tmp_path):
+    path = str(tmp_path / "wumpus.log")
+    logger = logging.getLogger("test_forked_process")
+    logger.propagate = False
+    start_queue_logging(logger, [logging.FileHandler(path)])
+
+    pid = os.fork()
+    if pid == 0:
+        # The child's own listener writes out the record, unlike the parent's listener, which is not carried over.
+        logger.warning("from the child")
+        os._exit(0 if written(path, "from the child") else 1)
+    _, status = os.waitpid(pid, 0)
+    assert os.WEXITSTATUS(status) == 0
+
+
+def drain(log_queue):
+    messages = []
+    while not log_queue.empty():
+        messages.append(log_queue.get_nowait().getMessage())
+    return messages
+
+
+@pytest.mark.parametrize("overflow, kept", [(DROP_NEWEST, [0, 1, 2]), (DROP_OLDEST, [2, 3, 4])])
+def test_full_queue_drops_records(overflow, kept):
+    handler = BoundedQueueHandler(queue.Queue(maxsize=3), overflow)
+    for index in range(5):
+        handler.handle(logging.makeLogRecord({"msg": f"record {index}"}))
+    assert drain(handler.queue) == [f"record {index}" for index in kept]
+
+    # Once there is room, the count of the records dropped precedes the next record.
+    handler.handle(logging.makeLogRecord({"msg": "record 5"}))
+    assert drain(handler.queue) == ["2 log records were dropped because the log queue was full.", "record 5"]
+    assert handler.dropped == 0
+
+
+def test_unknown_overflow_policy_is_rejected():
+    with pytest.raises(ValueError):
+        BoundedQueueHandler(queue.Queue(maxsize=3), "drop_everything")
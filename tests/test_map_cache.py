@@ -0,0 +1,18 @@
+import metrics
+from pieces.map_cache import MapCache
+
+
+def test_cache_counts_show_in_metrics():
+    cache = MapCache(maxsize=4)
+    collector = metrics.Collector(cache.stats, MapCache.METRICS)
+    try:
+        cache.put("key", "<svg/>")
+        cache.get("key")
+        cache.get("other key")
+        exposition = metrics.exposition()
+    finally:
+        metrics.registry.remove(collector)
+
+    assert "wumpus_map_cache_hits_total 1" in exposition
+    assert "wumpus_map_cache_misses_total 1" in exposition
+    assert "wumpus_map_cache_maps 1" in exposition
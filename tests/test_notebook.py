@@ -0,0 +1,77 @@
+import random
+
+import pytest
+
+from game import Game
+from pieces.map_renderer import SvgRenderer
+from pieces.notebook import Notebook
+
+
+class ChangesRenderer(SvgRenderer):
+    """
+    Renders the changes to the cavern map as the set of ids of the changed caves.
+    """
+
+    def render_changes(self, cavern_map, tunnels, current_cave_id, positions, cave_ids):
+        return set(cave_ids)
+
+
+@pytest.fixture
+def notebook_changes(monkeypatch):
+    monkeypatch.setattr(Notebook, "renderer", ChangesRenderer())
+
+
+def explore(seed, turns=10):
+    """
+    Wanders the hunter about the standard cavern system, consulting the notebook each turn as the application does.
+    :return: the game and the stamps of the notebook as they stood at each version of the cavern map
+    """
+    game = Game(rng=random.Random(seed))
+    rng = random.Random(seed)
+    notebook = game.hunter.notebook
+    notebook.consult_notebook(game.hunter.cave.id)
+    history = {notebook.version: dict(notebook.stamps)}
+    for _ in range(turns):
+        if not game.hunter.alive:
+            break
+        game.hunter.enter(rng.choice(game.hunter.cave.neighboring_caves), game.hazards)
+        notebook.consult_notebook(game.hunter.cave.id)
+        history[notebook.version] = dict(notebook.stamps)
+    return game, history
+
+
+# Seeds whose hunter lives to map several versions of the cavern map.
+SEEDS = [2, 3, 4, 6, 8]
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_changes_are_the_caves_stamped_since_the_version(notebook_changes, seed):
+    game, history = explore(seed)
+    notebook = game.hunter.notebook
+    assert notebook.version == max(history) > 1
+    for version in range(1, notebook.version + 1):
+        expected = {cave_id for cave_id, (stamp, _) in notebook.stamps.items() if stamp > version}
+        assert notebook.consult_notebook_changes(game.hunter.cave.id, version) == expected
+    # The current version needs no changes and consulting the notebook again makes none.
+    assert notebook.consult_notebook_changes(game.hunter.cave.id, notebook.version) == set()
+    assert notebook.stamps == history[notebook.version]
+
+
+@pytest.mark.parametrize("seed", SEEDS)
+def test_stamps_change_only_with_the_depiction(seed):
+    game, history = explore(seed)
+    versions = sorted(history)
+    for earlier, later in zip(versions, versions[1:]):
+        for cave_id, (stamp, flags) in history[later].items():
+            if cave_id in history[earlier] and history[earlier][cave_id][1] == flags:
+                assert stamp == history[earlier][cave_id][0]
+            else:
+                assert stamp == later
+
+
+@pytest.mark.parametrize("since_version", [None, 0, -1, True, "1", 1.0])
+def test_unknown_version_calls_for_the_whole_map(notebook_changes, since_version):
+    game, _ = explore(SEEDS[0])
+    notebook = game.hunter.notebook
+    assert notebook.consult_notebook_changes(game.hunter.cave.id, since_version) is None
+    assert notebook.consult_notebook_changes(game.hunter.cave.id, notebook.version + 1) is None
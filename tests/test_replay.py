@@ -0,0 +1,41 @@
+import os
+import random
+import time
+
+from game import Game
+from replay import ReplayRecorder, replay
+
+
+def test_recorded_game_replays(tmp_path):
+    recorder = ReplayRecorder(str(tmp_path))
+    game = Game(rng=random.Random(1))
+    game.hunter.narrate = False
+    recorder.start("game", game)
+    for cave_id in game.hunter.cave.neighboring_caves[:1]:
+        seed = recorder.begin_turn(game)
+        game.hunter.enter(cave_id, game.hazards)
+        recorder.record("game", "e", cave_id, seed, game)
+    with open(recorder.path("game"), "rb") as log:
+        assert replay(log.read()).hunter.cave.id == game.hunter.cave.id
+
+
+def test_recorder_keeps_no_more_than_the_maximum_number_of_logs(tmp_path):
+    recorder = ReplayRecorder(str(tmp_path), max_files=3)
+    for index in range(5):
+        recorder.start(f"game-{index}", Game(rng=random.Random(index)))
+        os.utime(recorder.path(f"game-{index}"), (index, time.time() - 100 + index))
+    recorder.prune()
+    assert sorted(os.listdir(tmp_path)) == ["game-2.wlog", "game-3.wlog", "game-4.wlog"]
+
+
+def test_recorder_removes_old_logs_and_does_not_revive_them(tmp_path):
+    recorder = ReplayRecorder(str(tmp_path), max_age=60)
+    game = Game(rng=random.Random(1))
+    recorder.start("old", game)
+    recorder.start("new", game)
+    os.utime(recorder.path("old"), (0, time.time() - 120))
+    recorder.prune()
+    assert os.listdir(tmp_path) == ["new.wlog"]
+
+    recorder.record("old", "e", game.hunter.cave.neighboring_caves[0], recorder.begin_turn(game), game)
+    assert os.listdir(tmp_path) == ["new.wlog"]
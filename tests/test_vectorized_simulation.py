@@ -0,0 +1,28 @@
+import numpy as np
+
+import vectorized_simulation
+from vectorized_simulation import BatchedGames, draw_excluding, sample_caves
+
+
+def test_engines_agree():
+    # Plays the same games with both engines, feeding them the same decisions and draws, and compares every turn.
+    assert vectorized_simulation.verify_against_object_engine(count=200, turns=60, seed=1) > 0
+
+
+def test_draw_excluding_skips_excluded_caves():
+    generator = np.random.default_rng(0)
+    caves = draw_excluding(generator, 10, np.tile([3, 3, 7, 1], (5000, 1)))
+    assert set(caves.tolist()) == {2, 4, 5, 6, 8, 9, 10}
+
+
+def test_sample_caves_draws_distinct_caves():
+    caves = sample_caves(np.random.default_rng(0), 6, 1000, 4)
+    assert caves.shape == (1000, 4)
+    assert all(len(set(row)) == 4 for row in caves.tolist())
+
+
+def test_random_games_place_the_hunter_clear_of_hazards():
+    games = BatchedGames.random(500, seed=2, bottomless_pit_count=10, bat_colony_count=10, cave_count=60)
+    hazards = np.hstack([games.wumpus[:, np.newaxis], games.bottomless_pits, games.bats])
+    assert not (hazards == games.hunter[:, np.newaxis]).any()
+    assert games.adjacency.shape == (500, 60, 3)
@@ -0,0 +1,427 @@
+"""
+Vectorized simulation of many games at once, for balance tuning and load modelling at a scale the object based
+simulation cannot reach.  The state of N games is held as a structure of arrays - the cavern systems as an
+(N, caves, neighboring caves) array of cave ids and the positions of the hunter and the hazards, the quivers and
+the disposition of the hunter and the Wumpus as vectors - and each turn is advanced for all games with array
+operations that follow the rules of Hunter.enter, Hunter.shoot, Wumpus.move and BatColony.check_encounter.
+
+Random draws are taken from a draw source so that the engine can be fed the very same draws as the object engine.
+verify_against_object_engine plays the same games both ways, turn by turn, and confirms that they agree.  Unlike
+the web application, the vectorized engine requires numpy.  tests/test_vectorized_simulation.py runs the same check
+under pytest.  Run from the top level of the wumpus project:
+
+python -m vectorized_simulation --games 100000
+python -m vectorized_simulation --verify
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+from game import Game
+from pieces.cavern_system import CavernSystem
+from pieces.hunter import Hunter
+
+IN_PROGRESS = 0
+WON = 1
+EATEN = 2
+FELL = 3
+TIMED_OUT = 4
+RESULTS = {WON: "WON", EATEN: "EATEN", FELL: "FELL", TIMED_OUT: "TIMED_OUT"}
+
+# Games not decided within this many turns are abandoned.
+MAX_TURNS = 200
+
+
+def cave_dtype(cave_count):
+    """
+    The smallest integer type able to hold the cave ids of a cavern system.
+    """
+    return np.int8 if cave_count < 2 ** 7 else np.int16 if cave_count < 2 ** 15 else np.int32
+
+
+def draw_excluding(generator, cave_count, excluded):
+    """
+    Draws a cave id for each game uniformly from the caves not excluded, without building the full range of cave ids.
+    A draw r from the caves remaining is shifted past each excluded cave id, in ascending order, that it reaches.
+    :param generator: numpy random number generator
+    :param cave_count: number of caves
+    :param excluded: (N, M) array of the cave ids excluded in each game, which may repeat
+    :return: vector of cave ids
+    """
+    excluded = np.sort(np.asarray(excluded, dtype=np.int64), axis=1)
+    repeated = np.zeros(excluded.shape, dtype=bool)
+    repeated[:, 1:] = excluded[:, 1:] == excluded[:, :-1]
+
+    # Repeated cave ids are moved past the last cave so that each excluded cave is skipped only once.
+    excluded = np.sort(np.where(repeated, cave_count + 1, excluded), axis=1)
+    caves = generator.integers(1, cave_count + 1 - (~repeated).sum(axis=1))
+    for column in excluded.T:
+        caves += caves >= column
+    return caves
+
+
+def sample_caves(generator, cave_count, count, sample_size):
+    """
+    Draws distinct cave ids for each game, one at a time from the caves not yet drawn.
+    :param generator: numpy random number generator
+    :param cave_count: number of caves
+    :param count: number of games
+    :param sample_size: number of cave ids to draw for each game
+    :return: (count, sample_size) array of cave ids
+    """
+    caves = np.empty((count, 0), dtype=np.int64)
+    for _ in range(sample_size):
+        caves = np.hstack([caves, draw_excluding(generator, cave_count, caves)[:, np.newaxis]])
+    return caves
+
+
+class GeneratorDraws:
+    """
+    Draw source taking uniform draws from a numpy random number generator.
+    """
+
+    def __init__(self, generator):
+        self.generator = generator
+
+    def uniform(self, mask):
+        """
+        Provides a uniform draw in [0, 1) for each game.  Only the draws for the games selected by the mask are used.
+        :param mask: boolean vector selecting the games that draw
+        :return: vector of draws
+        """
+        return self.generator.random(mask.shape[0])
+
+
+class StreamDraws:
+    """
+    Draw source taking uniform draws, game by game, from pre-drawn streams.  Each game advances through its own stream
+    only when it draws, just as each object game draws from its own random number generator.
+    """
+
+    def __init__(self, streams):
+        """
+        :param streams: (N, K) array of uniform draws in [0, 1), one stream of K draws per game
+        """
+        self.streams = streams
+        self.positions = np.zeros(streams.shape[0], dtype=np.int64)
+
+    def uniform(self, mask):
+        games = np.flatnonzero(mask)
+        draws = np.zeros(mask.shape[0])
+        draws[games] = self.streams[games, self.positions[games]]
+        self.positions[games] += 1
+        return draws
+
+
+class ScriptedRandom:
+    """
+    Stand-in for a game's random number generator that replays a stream of uniform draws, choosing from a sequence
+    exactly as the vectorized engine does.  Used to feed an object game the same draws as the vectorized engine.
+    """
+
+    def __init__(self, stream):
+        self.stream = iter(stream)
+
+    def random(self):
+        return float(next(self.stream))
+
+    def choice(self, sequence):
+        return sequence[int(self.random() * len(sequence))]
+
+    def randrange(self, stop):
+        return int(self.random() * stop)
+
+
+class BatchedGames:
+    """
+    The state of a batch of games held as a structure of arrays.
+    """
+
+    def __init__(self, adjacency, wumpus, bottomless_pits, bats, hunter, quiver=None, wumpus_asleep=None):
+        """
+        Initializes the batch.
+        :param adjacency: (N, caves, neighboring caves) array.  Row c - 1 of a game lists the ids of the caves
+        neighboring cave c, in the order given by the cavern system.
+        :param wumpus: vector of the Wumpus' cave ids
+        :param bottomless_pits: (N, bottomless pits) array of cave ids
+        :param bats: (N, bat colonies) array of cave ids
+        :param hunter: vector of the hunter's cave ids
+        :param quiver: vector of the arrows in the hunter's quiver.  Defaults to a full quiver.
+        :param wumpus_asleep: boolean vector of whether the Wumpus sleeps.  Defaults to asleep.
+        """
+        self.count, self.cave_count, self.neighboring_cave_count = adjacency.shape
+        dtype = cave_dtype(self.cave_count)
+        self.adjacency = adjacency.astype(dtype)
+        self.wumpus = np.asarray(wumpus, dtype=dtype)
+        self.bottomless_pits = np.asarray(bottomless_pits, dtype=dtype)
+        self.bats = np.asarray(bats, dtype=dtype)
+        self.hunter = np.asarray(hunter, dtype=dtype)
+        self.quiver = np.full(self.count, Hunter.ARROW_COUNT, dtype=np.int8) if quiver is None \
+            else np.asarray(quiver, dtype=np.int8)
+        self.wumpus_awake = np.zeros(self.count, dtype=bool) if wumpus_asleep is None \
+            else ~np.asarray(wumpus_asleep, dtype=bool)
+        self.wumpus_alive = np.ones(self.count, dtype=bool)
+        self.hunter_alive = np.ones(self.count, dtype=bool)
+        self.turns = np.zeros(self.count, dtype=np.int32)
+        self.games = np.arange(self.count)
+
+    @classmethod
+    def from_games(cls, games):
+        """
+        Gathers the state of object games into a batch.
+        :param games: list of games
+        :return: the batch
+        """
+        adjacency = np.array([[cave.neighboring_caves for cave in game.cavern_system.caves[1:]] for game in games])
+        return cls(adjacency,
+                   [game.wumpus.cave.id for game in games],
+                   [[bottomless_pit.cave.id for bottomless_pit in game.bottomless_pits] for game in games],
+                   [[bat_colony.cave.id for bat_colony in game.bats] for game in games],
+                   [game.hunter.cave.id for game in games],
+                   [game.hunter.quiver for game in games],
+                   [game.wumpus.asleep for game in games])
+
+    @classmethod
+    def random(cls, count, seed=None, bottomless_pit_count=2, bat_colony_count=2, cave_count=None,
+               neighboring_cave_count=None):
+        """
+        Creates a batch of new games.  The cavern systems are created by the cavern system generator.  The hazards are
+        placed as Game places them - the Wumpus in any cave, the bottomless pits in distinct caves and the bat colonies
+        in distinct caves - and the hunter in a cave free of hazards, all with vectorized draws of cave ids (rather
+        than by ranking every cave of every game).
+        :param count: number of games
+        :param seed: seed for the random number generators
+        :param bottomless_pit_count: number of bottomless pits per game
+        :param bat_colony_count: number of bat colonies per game
+        :param cave_count: number of caves per game (20 if not provided)
+        :param neighboring_cave_count: number of caves adjoining each cave (3 if not provided)
+        :return: the batch
+        """
+        rng = random.Random(seed)
+        generator = np.random.default_rng(rng.getrandbits(64))
+        cave_count = cave_count or CavernSystem.CAVE_COUNT
+        adjacency = np.array([list(CavernSystem.create_cavern_system(rng, cave_count, neighboring_cave_count).values())
+                              for _ in range(count)], dtype=cave_dtype(cave_count))
+        wumpus = generator.integers(1, cave_count + 1, size=count)
+        bottomless_pits = sample_caves(generator, cave_count, count, bottomless_pit_count)
+        bats = sample_caves(generator, cave_count, count, bat_colony_count)
+        hunter = draw_excluding(generator, cave_count, np.hstack([wumpus[:, np.newaxis], bottomless_pits, bats]))
+        return cls(adjacency, wumpus, bottomless_pits, bats, hunter)
+
+    @property
+    def active(self):
+        """
+        Boolean vector of the games still in progress.
+        """
+        return self.hunter_alive & self.wumpus_alive
+
+    def step(self, shoot, targets, draws):
+        """
+        Advances every game in progress by one turn.
+        :param shoot: boolean vector, true where the hunter shoots and false where the hunter enters a cave
+        :param targets: vector of the ids of the caves entered or shot into
+        :param draws: the draw source
+        """
+        active = self.active
+        self.turns[active] += 1
+        self.enter(active & ~shoot, targets, draws)
+        self.shoot(active & shoot, targets, draws)
+
+    def neighboring(self, games, caves):
+        """
+        The ids of the caves neighboring the given caves.
+        :param games: indices of the games
+        :param caves: vector of cave ids, one per game
+        :return: (games, neighboring caves) array of cave ids
+        """
+        return self.adjacency[games, caves.astype(np.int64) - 1]
+
+    def move_wumpus(self, moving, draws):
+        """
+        As with Wumpus.move, the Wumpus, if awake, moves into a randomly chosen neighboring cave.
+        :param moving: boolean vector of the games in which the Wumpus may move
+        """
+        moving = moving & self.wumpus_awake
+        choices = (draws.uniform(moving) * self.neighboring_cave_count).astype(np.int64)
+        games = np.flatnonzero(moving)
+        self.wumpus[games] = self.neighboring(games, self.wumpus[games])[np.arange(games.size), choices[games]]
+
+    def enter(self, entering, targets, draws):
+        """
+        As with Hunter.enter, the hunter enters a neighboring cave (an entry into any other cave is ignored), the
+        Wumpus moves and then the hunter encounters the hazards in the cave in order of lethality - the Wumpus, the
+        bottomless pits and then the bat colonies.  Bats drop the hunter into a randomly chosen cave other than their
+        own, which is then entered in turn, for as long as the hunter keeps being carried off by bats.
+        :param entering: boolean vector of the games in which the hunter enters a cave
+        :param targets: vector of the ids of the caves entered
+        """
+        games = np.flatnonzero(entering)
+        valid = (self.neighboring(games, self.hunter[games]) == targets[games, np.newaxis]).any(axis=1)
+        self.hunter[games[valid]] = targets[games[valid]]
+
+        pending = np.zeros(self.count, dtype=bool)
+        pending[games[valid]] = True
+        while pending.any():
+            self.move_wumpus(pending, draws)
+
+            eaten = pending & (self.hunter == self.wumpus)
+            self.wumpus_awake |= eaten
+            fell = pending & ~eaten & (self.bottomless_pits == self.hunter[:, np.newaxis]).any(axis=1)
+            self.hunter_alive &= ~(eaten | fell)
+
+            carried = pending & ~eaten & ~fell & (self.bats == self.hunter[:, np.newaxis]).any(axis=1)
+            choices = (draws.uniform(carried) * (self.cave_count - 1)).astype(np.int64) + 1
+            carried_games = np.flatnonzero(carried)
+            destinations = choices[carried_games]
+            destinations += destinations >= self.hunter[carried_games]
+            self.hunter[carried_games] = destinations
+            pending = carried
+
+    def shoot(self, shooting, targets, draws):
+        """
+        As with Hunter.shoot, the hunter, if any arrows remain, shoots into a cave.  The arrow either slays the Wumpus
+        or awakens it, in which case the Wumpus moves and may enter the hunter's cave.
+        :param shooting: boolean vector of the games in which the hunter shoots
+        :param targets: vector of the ids of the caves shot into
+        """
+        shooting = shooting & (self.quiver > 0)
+        self.quiver[shooting] -= 1
+        slain = shooting & (targets == self.wumpus)
+        self.wumpus_alive &= ~slain
+        missed = shooting & ~slain
+        self.wumpus_awake |= missed
+        self.move_wumpus(missed, draws)
+        self.hunter_alive &= ~(missed & (self.hunter == self.wumpus))
+
+    def results(self, max_turns=MAX_TURNS):
+        """
+        The result of each game.
+        :param max_turns: number of turns after which an undecided game counts as abandoned
+        :return: vector of result codes
+        """
+        results = np.full(self.count, IN_PROGRESS, dtype=np.int8)
+        results[~self.wumpus_alive] = WON
+        results[~self.hunter_alive & (self.hunter == self.wumpus)] = EATEN
+        results[~self.hunter_alive & (self.hunter != self.wumpus)] = FELL
+        results[self.active & (self.turns >= max_turns)] = TIMED_OUT
+        return results
+
+
+def random_policy(games, generator):
+    """
+    Vectorized counterpart of simulation.random_policy.  Wanders about at random, now and then shooting an arrow into a
+    randomly chosen adjoining cave.
+    :param games: the batch of games
+    :param generator: numpy random number generator
+    :return: tuple of the boolean vector of where to shoot and the vector of target cave ids
+    """
+    shoot = (games.quiver > 0) & (generator.random(games.count) < 0.1)
+    choices = generator.integers(0, games.neighboring_cave_count, size=games.count)
+    targets = games.neighboring(games.games, games.hunter)[games.games, choices]
+    return shoot, targets
+
+
+def run_batch(count, seed=None, max_turns=MAX_TURNS, policy=random_policy):
+    """
+    Plays a batch of games to completion (or until abandoned).
+    :param count: number of games
+    :param seed: seed for the batch
+    :param max_turns: number of turns after which a game is abandoned
+    :param policy: vectorized policy choosing the hunters' moves
+    :return: tuple of the dictionary of result counts, the total turns played, the time taken to create the games and
+    the time taken to play them
+    """
+    started = time.perf_counter()
+    games = BatchedGames.random(count, seed)
+    created = time.perf_counter()
+    generator = np.random.default_rng(seed)
+    draws = GeneratorDraws(generator)
+    for _ in range(max_turns):
+        if not games.active.any():
+            break
+        shoot, targets = policy(games, generator)
+        games.step(shoot, targets, draws)
+    results = games.results(max_turns)
+    counts = {name: int((results == code).sum()) for code, name in RESULTS.items()}
+    return counts, int(games.turns.sum()), created - started, time.perf_counter() - created
+
+
+def verify_against_object_engine(count=500, turns=100, seed=0, shot_probability=0.1):
+    """
+    Plays the same games with the object engine and the vectorized engine, feeding both the same policy decisions and
+    the same random draws, and compares the state of every game after every turn.
+    :param count: number of games
+    :param turns: number of turns
+    :param seed: seed for the games, the policy decisions and the random draws
+    :param shot_probability: probability of the hunter shooting (while arrows remain)
+    :return: number of game turns compared
+    :raises AssertionError: if the engines disagree
+    """
+    rng = random.Random(seed)
+    objects = [Game(rng=random.Random(rng.getrandbits(64))) for _ in range(count)]
+    batch = BatchedGames.from_games(objects)
+
+    generator = np.random.default_rng(seed)
+    streams = generator.random((count, 8 * turns + 16))
+    decisions = generator.random((turns, count))
+    choices = generator.integers(0, batch.neighboring_cave_count, size=(turns, count))
+    draws = StreamDraws(streams)
+    for game, stream in zip(objects, streams):
+        scripted = ScriptedRandom(stream)
+        for hazard in game.hazards:
+            hazard.rng = scripted
+
+    compared = 0
+    for turn in range(turns):
+        active = batch.active
+        shoot = (batch.quiver > 0) & (decisions[turn] < shot_probability)
+        targets = batch.neighboring(batch.games, batch.hunter)[batch.games, choices[turn]]
+        for index, game in enumerate(objects):
+            if not active[index]:
+                continue
+            hunter = game.hunter
+            target = hunter.cave.neighboring_caves[choices[turn, index]]
+            if hunter.quiver > 0 and decisions[turn, index] < shot_probability:
+                hunter.shoot(target, game.hazards)
+            else:
+                hunter.enter(target, game.hazards)
+        batch.step(shoot, targets, draws)
+
+        for index, game in enumerate(objects):
+            expected = (game.hunter.cave.id, game.hunter.alive, game.hunter.quiver,
+                        game.wumpus.cave.id, game.wumpus.alive, not game.wumpus.asleep)
+            actual = (int(batch.hunter[index]), bool(batch.hunter_alive[index]), int(batch.quiver[index]),
+                      int(batch.wumpus[index]), bool(batch.wumpus_alive[index]), bool(batch.wumpus_awake[index]))
+            assert expected == actual, f"Game {index} differs after turn {turn + 1}: {expected} != {actual}"
+            compared += active[index]
+        if not batch.active.any():
+            break
+    return int(compared)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Plays batches of games with the vectorized engine.")
+    parser.add_argument("--games", type=int, default=100_000, help="number of games to play")
+    parser.add_argument("--seed", type=int, default=None, help="seed for the batch")
+    parser.add_argument("--max-turns", type=int, default=MAX_TURNS, help="turns after which a game is abandoned")
+    parser.add_argument("--verify", action="store_true", help="verify agreement with the object engine")
+    args = parser.parse_args()
+
+    if args.verify:
+        compared = verify_against_object_engine(seed=args.seed or 0)
+        print(f"The engines agree over {compared} game turns.")
+        return
+
+    counts, turns, setup, elapsed = run_batch(args.games, args.seed, args.max_turns)
+    print(f"{args.games} games created in {setup:.2f}s")
+    print(f"{args.games} games ({turns} turns) played in {elapsed:.2f}s: "
+          f"{args.games / elapsed:.0f} games/s, {turns / elapsed:.0f} turns/s")
+    for result, count in counts.items():
+        print(f"{result:>10}: {count:>9} ({count / args.games:.1%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+WSGI entry point for serving the game in production.  The flask application is served by gunicorn with as many worker
+processes as are configured, each handling requests on a pool of threads, so that one request drawing a cavern map (or
+waiting on the graphviz subprocess or the game store) does not hold up the others.  Since each worker process keeps its
+own memory, the sqlite game store (the production default) should be used with more than one worker.  Run from the top
+level of the wumpus project:
+
+python wsgi.py
+
+or, equivalently,
+
+gunicorn wsgi:app --bind 0.0.0.0:8000 --workers 4 --threads 8
+"""
+
+from gunicorn.app.base import BaseApplication
+
+from app import app, game_pool
+
+
+class WumpusServer(BaseApplication):
+    """
+    Gunicorn, configured from the application settings rather than from its command line.
+    """
+
+    def __init__(self, application, options):
+        """
+        Initializes the server.
+        :param application: the flask application
+        :param options: gunicorn settings (e.g., bind, workers, threads)
+        """
+        self.application = application
+        self.options = options
+        super().__init__()
+
+    def load_config(self):
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        return self.application
+
+
+def post_fork(server, worker):
+    """
+    Fills each worker process's game pool as the worker starts, rather than on the worker's first new game.
+    :param server: the gunicorn arbiter
+    :param worker: the worker process just forked
+    """
+    if game_pool:
+        game_pool.start()
+
+
+if __name__ == "__main__":
+    WumpusServer(app, {"bind": f"{app.config.get('HOST', '127.0.0.1')}:{int(app.config.get('PORT', 8000))}",
+                       "workers": int(app.config.get('WEB_WORKERS', 1)),
+                       "threads": int(app.config.get('WEB_THREADS', 8)),
+                       "worker_class": "gthread",
+                       "post_fork": post_fork}).run()